@@ -2,20 +2,30 @@
 import tkinter as tk # Importing the tkinter library for GUI
 import tkcalendar as tkc
 import calendar
+import csv
 import datetime
+import json
 import sqlite3 # Importing sqlite3 for database interactions
 import re
 import random
+import heapq
 import yagmail
 import os
 import string
+import threading
+from contextlib import contextmanager
 from tkinter import messagebox
 from tkinter import ttk
 from tkinter import simpledialog # Importing specific components from tkinter
+from tkinter import filedialog
 from tkinter.simpledialog import askstring
 from tkinter import *
 from time import strftime
 from PIL import Image, ImageTk # Importing PIL for image handling
+try:
+    import numpy as np # Only needed by the vectorized solver
+except ImportError:
+    np = None
 
 class MyTimetableApp:
     """Main application class for managing the GUI."""
@@ -32,39 +42,9 @@ class MyTimetableApp:
 
         self.allocated = False
 
-        today = datetime.datetime.now()
-
-        try:
-            """Tries to open the file and sets it to False if empty"""
-            f = open('state.txt', 'r')
-            value = f.read().strip()
-            if not value:
-                value = "False"
-            self.Cleared = value
-            f.close()
-        except FileNotFoundError:
-            """Creates the file and sets the default state to False"""
-            f = open("AbsenceLog.txt", "a")
-            f.close()
-            self.Cleared = "False"
-
-        if self.Cleared == "False" and today.day == 1:
-            """Clears Current Covers and sets state to cleared"""
-
-            teachers = database.get_all_usernames()
-            for teacher in teachers:
-                database.reset_current_covers(teacher)
-
-            self.Cleared = "True"
-            f = open('state.txt', 'w')
-            f.write(self.Cleared)
-            f.close()
-
-        elif today.day != 1:
-            self.Cleared = "False"
-            f = open('state.txt', 'w')
-            f.write(self.Cleared)
-            f.close()
+        # Current covers are monthly, this catches up if the program wasn't open on the 1st
+        database.reset_covers_for_period(datetime.date.today())
+        self.cover_period = datetime.date.today().strftime("%Y-%m")
 
         # Create a container frame
         self.container = tk.Frame(root)
@@ -139,11 +119,17 @@ class MyTimetableApp:
     def window_close(self):
         self.root.destroy()
         database.delete_absence()
+        database.close() # Releases every pooled connection on exit
 
     def check_time(self):
         #Check the time periodically and run cover allocation and reverts the allocations at the right time.
         now = datetime.datetime.now()
 
+        # Runs the monthly reset if the program has been left open into a new month
+        if now.strftime("%Y-%m") != self.cover_period:
+            database.reset_covers_for_period(now)
+            self.cover_period = now.strftime("%Y-%m")
+
         # Allocate covers between 6:30 and 7:00 AM if not already allocated
         if now.hour == 6 and now.minute >= 30 and not self.allocated:
             M = MainAlgorithm(self)
@@ -163,10 +149,127 @@ class MyTimetableApp:
 class Database:
     """Class for managing database interactions for the application"""
 
-    def __init__(self):
-            """Initialize the database and creates necessary tables."""
-            connection = sqlite3.connect('MyTimetable.db') # Establish a connection to the SQLite database
-            cursor = connection.cursor() # Create a cursor object to execute SQL commands
+    DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday") # School days stored in the Lessons table
+    VIEW_VERSION = "2" # Changed whenever TimetableView's definition changes, so existing databases rebuild it once on their next start
+
+    # PRAGMAs applied to every connection so several workstations can read while an allocation run is writing
+    CONNECTION_PROFILE = {
+        "journal_mode": "WAL", # Readers see the last commit instead of waiting behind the writer
+        "synchronous": "NORMAL", # Safe in WAL mode and only syncs at checkpoints rather than every commit
+        "cache_size": -16000, # Page cache of about 16MB (negative values are in KB)
+        "mmap_size": 134217728, # Reads up to 128MB of the file through memory mapping
+        "busy_timeout": 5000, # Waits up to 5 seconds for a lock instead of failing with "database is locked"
+    }
+
+    # Every statement the program runs, by name. Reusing the exact same text lets each connection's statement
+    # cache hand back the already prepared statement, and the day is always a parameter rather than part of the SQL
+    QUERIES = {
+        "add_teacher": """INSERT INTO Teachers VALUES (?, ?, ?, ?, ?, ?)""",
+        "get_teacher": """SELECT Username, Fullname, Role, Subject_Department, Current_Covers, Cover_Limit FROM Teachers WHERE Username = ?""",
+        "increment_current_covers": """UPDATE Teachers SET Current_Covers = Current_Covers + 1 WHERE Username = ?""",
+        "set_current_covers": """UPDATE Teachers SET Current_Covers = ? WHERE Username = ?""",
+        "reset_all_current_covers": """UPDATE Teachers SET Current_Covers = 0""",
+        "add_setting": """INSERT OR IGNORE INTO Settings VALUES (?, ?)""",
+        "get_setting": """SELECT Value FROM Settings WHERE Name = ?""",
+        "set_setting": """INSERT OR REPLACE INTO Settings VALUES (?, ?)""",
+        # Only moves forward, so a period is claimed once even if several workstations start together or a clock goes back
+        "advance_setting": """UPDATE Settings SET Value = ? WHERE Name = ? AND Value < ?""",
+        "add_lesson": """INSERT INTO Lessons (Username, Day, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?, ?)""",
+        "edit_lesson": """UPDATE Lessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Day = ? AND Lesson_Number = ?""",
+        "add_assignment": """INSERT OR REPLACE INTO CoverAssignments (Date, Day, Lesson_Number, Absent_Username, Cover_Username, Status) VALUES (?, ?, ?, ?, ?, ?)""",
+        "complete_assignments": """UPDATE CoverAssignments SET Status = 'Completed' WHERE Status = 'Active' AND Date <= ?""",
+        "get_active_cover": """SELECT Cover_Username FROM CoverAssignments WHERE Date = ? AND Lesson_Number = ? AND Absent_Username = ? AND Status = 'Active' AND Cover_Username IS NOT NULL""",
+        "get_class_covers": """
+            SELECT CoverAssignments.Lesson_Number, CoverAssignments.Cover_Username, CoverAssignments.Absent_Username, CoverAssignments.Status
+            FROM CoverAssignments
+            JOIN Lessons ON Lessons.Username = CoverAssignments.Absent_Username
+                AND Lessons.Day = CoverAssignments.Day AND Lessons.Lesson_Number = CoverAssignments.Lesson_Number
+            WHERE CoverAssignments.Date = ? AND Lessons.Class = ?
+            ORDER BY CoverAssignments.Lesson_Number""",
+        "get_cover_history": """SELECT Date, Day, Lesson_Number, Absent_Username, Status FROM CoverAssignments WHERE Cover_Username = ? ORDER BY Date, Lesson_Number""",
+        "get_covers_given": """SELECT Lesson_Number, Absent_Username FROM CoverAssignments WHERE Cover_Username = ? AND Date = ? AND Status = 'Active'""",
+        "add_current_covers": """UPDATE Teachers SET Current_Covers = Current_Covers + ? WHERE Username = ?""",
+        "count_covers_since": """SELECT Cover_Username, COUNT(*) FROM CoverAssignments WHERE Date >= ? AND Status != 'Unfilled' GROUP BY Cover_Username""",
+        "count_covers_between": """SELECT Cover_Username, COUNT(*) FROM CoverAssignments WHERE Date >= ? AND Date <= ? AND Status != 'Unfilled' GROUP BY Cover_Username""",
+        # Both sides of every cover in a date range per teacher, each subquery is one range over the CoverAssignments_Date index
+        "get_cover_report": """
+            SELECT Teachers.Subject_Department, Teachers.Username, Teachers.Fullname, Teachers.Cover_Limit,
+                   COALESCE(Taken.Covers, 0), COALESCE(Needed.Covers, 0), COALESCE(Needed.Unfilled, 0)
+            FROM Teachers
+            LEFT JOIN (SELECT Cover_Username, COUNT(*) AS Covers FROM CoverAssignments
+                       WHERE Date >= ? AND Date <= ? AND Status != 'Unfilled' GROUP BY Cover_Username) AS Taken
+                ON Taken.Cover_Username = Teachers.Username
+            LEFT JOIN (SELECT Absent_Username, COUNT(*) AS Covers, SUM(Status = 'Unfilled') AS Unfilled FROM CoverAssignments
+                       WHERE Date >= ? AND Date <= ? GROUP BY Absent_Username) AS Needed
+                ON Needed.Absent_Username = Teachers.Username
+            ORDER BY Teachers.Subject_Department, Teachers.Fullname""",
+        "count_covers_by_date": """SELECT Date, Cover_Username, COUNT(*) FROM CoverAssignments WHERE Date > ? AND Status != 'Unfilled' GROUP BY Date, Cover_Username""",
+        "get_all_teachers": """SELECT * FROM Teachers""",
+        "get_all_usernames": """SELECT Username FROM Teachers""",
+        "get_all_lessons": """SELECT Username, Lesson_Number, Subject, Class, Substitute FROM TimetableView WHERE Username = ? AND Day = ? ORDER BY Lesson_Number""",
+        "get_one_lesson": """SELECT Username, Lesson_Number, Subject, Class, Substitute FROM TimetableView WHERE Username = ? AND Day = ? AND Lesson_Number = ?""",
+        "get_week_lessons": """SELECT Day, Username, Lesson_Number, Subject, Class, Substitute FROM TimetableView WHERE Username = ? ORDER BY Day, Lesson_Number""",
+        # One date's lessons with only that date's covers joined, what an allocation run for the date works from
+        "get_date_lessons": """
+            SELECT Lessons.Username, Lessons.Lesson_Number,
+                   COALESCE(Covered.Subject, Lessons.Subject), COALESCE(Covered.Class, Lessons.Class),
+                   CASE
+                       WHEN Covering.Cover_Username IS NOT NULL THEN 'Subbing' || char(10) || COALESCE(Absent.Fullname, Covering.Absent_Username)
+                       WHEN Subbed.Cover_Username IS NOT NULL THEN 'Subbed' || char(10) || 'by ' || Subbed.Cover_Username
+                       ELSE Lessons.Substitute
+                   END
+            FROM Lessons
+            LEFT JOIN CoverAssignments AS Covering ON Covering.Status = 'Active' AND Covering.Date = ? AND Covering.Cover_Username = Lessons.Username
+                AND Covering.Day = Lessons.Day AND Covering.Lesson_Number = Lessons.Lesson_Number
+            LEFT JOIN Lessons AS Covered ON Covered.Username = Covering.Absent_Username
+                AND Covered.Day = Covering.Day AND Covered.Lesson_Number = Covering.Lesson_Number
+            LEFT JOIN Teachers AS Absent ON Absent.Username = Covering.Absent_Username
+            LEFT JOIN CoverAssignments AS Subbed ON Subbed.Status = 'Active' AND Subbed.Date = ? AND Subbed.Absent_Username = Lessons.Username
+                AND Subbed.Day = Lessons.Day AND Subbed.Lesson_Number = Lessons.Lesson_Number
+            WHERE Lessons.Day = ?""",
+        "get_teacher_records": """SELECT Username, Fullname, Role, Subject_Department, Current_Covers, Cover_Limit FROM Teachers""",
+        "delete_teacher_user": """DELETE FROM Teachers WHERE Username = ?""",
+        "delete_teacher_data": """DELETE FROM Lessons WHERE Username = ?""",
+        "add_absence": """INSERT INTO AbsenceLog (Username, Date, Reason) VALUES (?, ?, ?)""",
+        "delete_absence": """DELETE FROM AbsenceLog WHERE Date = ?""",
+        "is_absent": """SELECT * FROM AbsenceLog WHERE Username = ? AND Date = ?""",
+        "get_absent_on": """SELECT Username FROM AbsenceLog WHERE Date = ?""",
+        "create_run_covers": """CREATE TEMP TABLE IF NOT EXISTS RunCovers (Username TEXT, Lesson_Number INTEGER)""",
+        "index_run_covers": """CREATE INDEX IF NOT EXISTS temp.RunCovers_Username ON RunCovers (Username)""",
+        "clear_run_covers": """DELETE FROM temp.RunCovers""",
+        "add_run_cover": """INSERT INTO temp.RunCovers (Username, Lesson_Number) VALUES (?, ?)""",
+        "get_free_candidates": """
+            SELECT Lessons.Username, Teachers.Subject_Department,
+                   Teachers.Current_Covers + (SELECT COUNT(*) FROM temp.RunCovers WHERE RunCovers.Username = Lessons.Username) AS Covers,
+                   Teachers.Cover_Limit
+            FROM Lessons
+            JOIN Teachers ON Teachers.Username = Lessons.Username
+            WHERE Lessons.Day = ? AND Lessons.Lesson_Number = ? AND Lessons.Subject = 'Free'
+              AND typeof(Teachers.Cover_Limit) = 'integer' AND Teachers.Cover_Limit > 0
+              AND NOT EXISTS (SELECT 1 FROM AbsenceLog WHERE AbsenceLog.Username = Lessons.Username AND AbsenceLog.Date = ?)
+              AND NOT EXISTS (SELECT 1 FROM CoverAssignments WHERE CoverAssignments.Status = 'Active' AND CoverAssignments.Cover_Username = Lessons.Username
+                  AND CoverAssignments.Day = Lessons.Day AND CoverAssignments.Lesson_Number = Lessons.Lesson_Number AND CoverAssignments.Date = ?)
+            ORDER BY Covers * 1.0 / Teachers.Cover_Limit, Lessons.Username""",
+        "store_password": """INSERT INTO Hashing (Username, Salt, Hash_Value) VALUES (?, ?, ?)""",
+        "delete_password": """DELETE FROM Hashing WHERE Username = ?""",
+        "get_hash": """SELECT Hash_Value FROM Hashing WHERE Username = ?""",
+        "get_salt": """SELECT Salt FROM Hashing WHERE Username = ?""",
+    }
+
+    def __init__(self, path='MyTimetable.db', profile=None):
+        """Initialize the database and creates necessary tables."""
+        self.path = path # Location of the SQLite database file
+        self.profile = profile if profile is not None else self.CONNECTION_PROFILE # PRAGMAs for every new connection
+        self.local = threading.local() # Stores one connection per thread so threads never share a cursor
+        self.connections = [] # Keeps every opened connection so close() can release them all
+        self.lock = threading.Lock() # Guards the connections list
+        self.teacher_cache = {} # Username -> TeacherRecord, filled on first lookup
+        self.cache_hits = 0 # Lookups answered from the cache
+        self.cache_misses = 0 # Lookups that had to query the Teachers table
+        self.cover_windows = None # CoverWindows kept up to date by apply_cover_assignments once something asks for them
+        self.cover_windows_version = None # PRAGMA data_version when the windows were read, to notice other workstations' covers
+
+        with self.transaction() as cursor: # Creates all the tables in a single transaction
 
             # Create Teachers table if it does not exist to ensure a new table isn't created at run everytime
             cursor.execute("""CREATE TABLE IF NOT EXISTS Teachers (
@@ -178,56 +281,22 @@ class Database:
                 Cover_Limit INTEGER
                 )""")
             
-            #Table creation for the 5 das of the week
-            cursor.execute("""CREATE TABLE IF NOT EXISTS MondayLessons (
-                Username TEXT,
-                Lesson_Number INTEGER,
-                Subject TEXT,
-                Class TEXT,
-                Substitute TEXT,
-                PRIMARY KEY (Username, Lesson_Number),
-                FOREIGN KEY (Username) REFERENCES Teachers(Username)
-                )""")
-            
-            cursor.execute("""CREATE TABLE IF NOT EXISTS TuesdayLessons (
-                Username TEXT,
-                Lesson_Number INTEGER,
-                Subject TEXT,
-                Class TEXT,
-                Substitute TEXT,
-                PRIMARY KEY (Username, Lesson_Number),
-                FOREIGN KEY (Username) REFERENCES Teachers(Username)
-                )""")
-            
-            cursor.execute("""CREATE TABLE IF NOT EXISTS WednesdayLessons (
-                Username TEXT,
-                Lesson_Number INTEGER,
-                Subject TEXT,
-                Class TEXT,
-                Substitute TEXT,
-                PRIMARY KEY (Username, Lesson_Number),
-                FOREIGN KEY (Username) REFERENCES Teachers(Username)
-                )""")
-            
-            cursor.execute("""CREATE TABLE IF NOT EXISTS ThursdayLessons (
+            # One table holds the lessons for all 5 days of the week, keyed by teacher, day and lesson number
+            cursor.execute("""CREATE TABLE IF NOT EXISTS Lessons (
                 Username TEXT,
+                Day TEXT,
                 Lesson_Number INTEGER,
                 Subject TEXT,
                 Class TEXT,
                 Substitute TEXT,
-                PRIMARY KEY (Username, Lesson_Number),
+                PRIMARY KEY (Username, Day, Lesson_Number),
                 FOREIGN KEY (Username) REFERENCES Teachers(Username)
                 )""")
 
-            cursor.execute("""CREATE TABLE IF NOT EXISTS FridayLessons (
-                Username TEXT,
-                Lesson_Number INTEGER,
-                Subject TEXT,
-                Class TEXT,
-                Substitute TEXT,
-                PRIMARY KEY (Username, Lesson_Number),
-                FOREIGN KEY (Username) REFERENCES Teachers(Username)
-                )""")
+            # Secondary index so whole-day and per-period lookups across every teacher avoid a full table scan
+            cursor.execute("""CREATE INDEX IF NOT EXISTS Lessons_Day_Period ON Lessons (Day, Lesson_Number, Subject)""")
+
+            self.migrate_day_tables(cursor) # Moves any data left in the old per-day tables into Lessons
             
             cursor.execute("""CREATE TABLE IF NOT EXISTS AbsenceLog (
                 Username TEXT,
@@ -235,7 +304,71 @@ class Database:
                 Reason TEXT,
                 PRIMARY KEY (Username, Date)
                 )""")
+
+            # The primary key starts with Username so date-first lookups need their own index
+            cursor.execute("""CREATE INDEX IF NOT EXISTS AbsenceLog_Date ON AbsenceLog (Date)""")
             
+            cursor.execute("""SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'CoverAssignments'""")
+            upgrading = cursor.fetchone() is None # Covers saved before this table existed are moved into it once it's made
+
+            # One row per cover needing lesson, Status is Active until the day is reverted, then Completed, or Unfilled if nobody was free
+            # Lessons rows are never changed by a cover, the timetable view joins this table to show who is covering what
+            cursor.execute("""CREATE TABLE IF NOT EXISTS CoverAssignments (
+                Date TEXT,
+                Day TEXT,
+                Lesson_Number INTEGER,
+                Absent_Username TEXT,
+                Cover_Username TEXT,
+                Status TEXT,
+                PRIMARY KEY (Date, Lesson_Number, Absent_Username)
+                )""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS CoverAssignments_Date ON CoverAssignments (Date)""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS CoverAssignments_Cover ON CoverAssignments (Cover_Username, Date)""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS CoverAssignments_Absent ON CoverAssignments (Absent_Username, Date)""")
+
+            # Partial indexes over the few active covers, used by the timetable view for every lesson it shows
+            cursor.execute("""CREATE INDEX IF NOT EXISTS CoverAssignments_Active_Cover ON CoverAssignments (Cover_Username, Day, Lesson_Number) WHERE Status = 'Active'""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS CoverAssignments_Active_Absent ON CoverAssignments (Absent_Username, Day, Lesson_Number) WHERE Status = 'Active'""")
+
+            if upgrading:
+                self.migrate_covers(cursor)
+
+            # Small name -> value store for state that has to outlive the program, like when covers were last reset
+            cursor.execute("""CREATE TABLE IF NOT EXISTS Settings (
+                Name TEXT,
+                Value TEXT,
+                PRIMARY KEY (Name)
+                )""")
+            if self.get_setting("Last_Cover_Reset") is None: # First start since the reset stopped using state.txt
+                cursor.execute(self.QUERIES["add_setting"], ("Last_Cover_Reset", self.legacy_reset_period()))
+
+            # Lessons as the timetable screens show them, with the Subbing and Subbed text worked out from the active covers
+            # Only covers dated in the next seven days are joined, so each weekday shows a single date even when covers are planned further ahead
+            # Only rebuilt when it is missing or VIEW_VERSION has changed, so a normal start doesn't rewrite the schema
+            cursor.execute("""SELECT name FROM sqlite_master WHERE type = 'view' AND name = 'TimetableView'""")
+            if cursor.fetchone() is None or self.get_setting("TimetableView_Version") != self.VIEW_VERSION:
+                cursor.execute("""DROP VIEW IF EXISTS TimetableView""")
+                cursor.execute("""CREATE VIEW TimetableView AS
+                    SELECT Lessons.Username, Lessons.Day, Lessons.Lesson_Number,
+                           COALESCE(Covered.Subject, Lessons.Subject) AS Subject,
+                           COALESCE(Covered.Class, Lessons.Class) AS Class,
+                           CASE
+                               WHEN Covering.Cover_Username IS NOT NULL THEN 'Subbing' || char(10) || COALESCE(Absent.Fullname, Covering.Absent_Username)
+                               WHEN Subbed.Cover_Username IS NOT NULL THEN 'Subbed' || char(10) || 'by ' || Subbed.Cover_Username
+                               ELSE Lessons.Substitute
+                           END AS Substitute
+                    FROM Lessons
+                    LEFT JOIN CoverAssignments AS Covering ON Covering.Status = 'Active' AND Covering.Cover_Username = Lessons.Username
+                        AND Covering.Day = Lessons.Day AND Covering.Lesson_Number = Lessons.Lesson_Number
+                        AND Covering.Date BETWEEN date('now', 'localtime') AND date('now', 'localtime', '+6 days')
+                    LEFT JOIN Lessons AS Covered ON Covered.Username = Covering.Absent_Username
+                        AND Covered.Day = Covering.Day AND Covered.Lesson_Number = Covering.Lesson_Number
+                    LEFT JOIN Teachers AS Absent ON Absent.Username = Covering.Absent_Username
+                    LEFT JOIN CoverAssignments AS Subbed ON Subbed.Status = 'Active' AND Subbed.Absent_Username = Lessons.Username
+                        AND Subbed.Day = Lessons.Day AND Subbed.Lesson_Number = Lessons.Lesson_Number
+                        AND Subbed.Date BETWEEN date('now', 'localtime') AND date('now', 'localtime', '+6 days')""")
+                cursor.execute(self.QUERIES["set_setting"], ("TimetableView_Version", self.VIEW_VERSION))
+
             cursor.execute("""CREATE TABLE IF NOT EXISTS Hashing (
                 Username TEXT,
                 Salt TEXT,
@@ -247,341 +380,549 @@ class Database:
             cursor.execute("""INSERT OR IGNORE INTO Teachers VALUES ("a", "It Worked", "SLT", "Mathematics", 0, 11)""")
             cursor.execute("""INSERT OR IGNORE INTO Hashing VALUES ("a", "rxaax85xc2Oxe8xb5xf4xa29xe0txacx19xf1q", "2156371292")""")
 
-            cursor.executemany("""INSERT OR IGNORE INTO MondayLessons VALUES (?, ?, ?, ?, ?)""", [
-                ("a", 1, "Maths", "11J", "None"),
-                ("a", 2, "Free", " ", " "),
-                ("a", 3, "Free", " ", " "),
-                ("a", 4, "Free", " ", " "),
-                ("a", 5, "Free", " ", " "),
-                ("a", 6, "CS", "COL3", "None"),
-                ("a", 7, "CS", "COL3", "None")
+            cursor.executemany("""INSERT OR IGNORE INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", [
+                ("a", "Monday", 1, "Maths", "11J", "None"),
+                ("a", "Monday", 2, "Free", " ", " "),
+                ("a", "Monday", 3, "Free", " ", " "),
+                ("a", "Monday", 4, "Free", " ", " "),
+                ("a", "Monday", 5, "Free", " ", " "),
+                ("a", "Monday", 6, "CS", "COL3", "None"),
+                ("a", "Monday", 7, "CS", "COL3", "None")
             ])
 
             # Insert Tuesday lessons
-            cursor.executemany("""INSERT OR IGNORE INTO TuesdayLessons VALUES (?, ?, ?, ?, ?)""", [
-                ("a", 1, "Maths", "11J", "None"),
-                ("a", 2, "BUS", "10G", "None"),
-                ("a", 3, "Free", " ", " "),
-                ("a", 4, "Free", " ", " "),
-                ("a", 5, "Free", " ", " "),
-                ("a", 6, "CS", "COL3", "None"),
-                ("a", 7, "Free", " ", " ")
+            cursor.executemany("""INSERT OR IGNORE INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", [
+                ("a", "Tuesday", 1, "Maths", "11J", "None"),
+                ("a", "Tuesday", 2, "BUS", "10G", "None"),
+                ("a", "Tuesday", 3, "Free", " ", " "),
+                ("a", "Tuesday", 4, "Free", " ", " "),
+                ("a", "Tuesday", 5, "Free", " ", " "),
+                ("a", "Tuesday", 6, "CS", "COL3", "None"),
+                ("a", "Tuesday", 7, "Free", " ", " ")
             ])
 
             # Insert Wednesday lessons
-            cursor.executemany("""INSERT OR IGNORE INTO WednesdayLessons VALUES (?, ?, ?, ?, ?)""", [
-                ("a", 1, "BUS", "10G", "None"),
-                ("a", 2, "Free", " ", " "),
-                ("a", 3, "Free", " ", " "),
-                ("a", 4, "Maths", "11J", "None"),
-                ("a", 5, "Free", " ", " "),
-                ("a", 6, "BUS", "10G", "None"),
-                ("a", 7, "Maths", "11J", "None")
+            cursor.executemany("""INSERT OR IGNORE INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", [
+                ("a", "Wednesday", 1, "BUS", "10G", "None"),
+                ("a", "Wednesday", 2, "Free", " ", " "),
+                ("a", "Wednesday", 3, "Free", " ", " "),
+                ("a", "Wednesday", 4, "Maths", "11J", "None"),
+                ("a", "Wednesday", 5, "Free", " ", " "),
+                ("a", "Wednesday", 6, "BUS", "10G", "None"),
+                ("a", "Wednesday", 7, "Maths", "11J", "None")
             ])
 
             # Insert Thursday lessons
-            cursor.executemany("""INSERT OR IGNORE INTO ThursdayLessons VALUES (?, ?, ?, ?, ?)""", [
-                ("a", 1, "Free", " ", " "),
-                ("a", 2, "BUS", "10G", "None"),
-                ("a", 3, "BUS", "10G", "None"),
-                ("a", 4, "BUS", "10G", "None"),
-                ("a", 5, "CS", "COL3", "None"),
-                ("a", 6, "CS", "COL3", "None"),
-                ("a", 7, "Maths", "11J", "None")
+            cursor.executemany("""INSERT OR IGNORE INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", [
+                ("a", "Thursday", 1, "Free", " ", " "),
+                ("a", "Thursday", 2, "BUS", "10G", "None"),
+                ("a", "Thursday", 3, "BUS", "10G", "None"),
+                ("a", "Thursday", 4, "BUS", "10G", "None"),
+                ("a", "Thursday", 5, "CS", "COL3", "None"),
+                ("a", "Thursday", 6, "CS", "COL3", "None"),
+                ("a", "Thursday", 7, "Maths", "11J", "None")
             ])
 
             # Insert Friday lessons
-            cursor.executemany("""INSERT OR IGNORE INTO FridayLessons VALUES (?, ?, ?, ?, ?)""", [
-                ("a", 1, "Maths", "11J", "None"),
-                ("a", 2, "CS", "COL3", "None"),
-                ("a", 3, "Free", " ", " "),
-                ("a", 4, "Free", " ", " "),
-                ("a", 5, "Free", " ", " ")
+            cursor.executemany("""INSERT OR IGNORE INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", [
+                ("a", "Friday", 1, "Maths", "11J", "None"),
+                ("a", "Friday", 2, "CS", "COL3", "None"),
+                ("a", "Friday", 3, "Free", " ", " "),
+                ("a", "Friday", 4, "Free", " ", " "),
+                ("a", "Friday", 5, "Free", " ", " ")
             ])
 
-            connection.commit()
-            connection.close()
-    
-    def add_teacher(self, username, fullname, role, subject_department, current_covers, cover_limit):
-        connection = sqlite3.connect('MyTimetable.db')
+
+    def migrate_day_tables(self, cursor):
+        """Copies lessons from the old MondayLessons to FridayLessons tables into Lessons and drops them"""
+        for day in self.DAYS:
+            cursor.execute("""SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?""", (f"{day}Lessons",))
+            if cursor.fetchone() is None:
+                continue # Nothing to migrate for this day
+
+            # Table names can't be parameters, but day only ever comes from the fixed DAYS tuple
+            cursor.execute(f"""INSERT OR IGNORE INTO Lessons (Username, Day, Lesson_Number, Subject, Class, Substitute)
+                            SELECT Username, ?, Lesson_Number, Subject, Class, Substitute FROM {day}Lessons""", (day,))
+            cursor.execute(f"""DROP TABLE {day}Lessons""")
+
+    def migrate_covers(self, cursor):
+        """Moves covers saved by older versions, which wrote Subbing and Subbed text into Lessons, into CoverAssignments"""
+        # Text is only left on the timetable until that day's revert, so each marked weekday is its most recent date
+        today = datetime.date.today()
+        dates = [((today - datetime.timedelta(days=(today.weekday() - x) % 7)).strftime("%Y-%m-%d"), day) for x, day in enumerate(self.DAYS)]
+
+        # The absent teacher's row says who is covering it, e.g. "Subbed\nby a_gfs"
+        cursor.executemany("""INSERT OR IGNORE INTO CoverAssignments (Date, Day, Lesson_Number, Absent_Username, Cover_Username, Status)
+                            SELECT ?, Day, Lesson_Number, Username, substr(Substitute, length('Subbed' || char(10) || 'by ') + 1), 'Active'
+                            FROM Lessons WHERE Day = ? AND Substitute LIKE 'Subbed%'""", dates)
+
+        # Puts the lessons back the way the old revert did, the covers are now shown from CoverAssignments instead
+        cursor.execute("""UPDATE Lessons SET Subject = 'Free', Class = '', Substitute = '' WHERE Substitute LIKE 'Subbing%'""")
+        cursor.execute("""UPDATE Lessons SET Substitute = 'None' WHERE Substitute LIKE 'Subbed%'""")
+
+    def get_connection(self):
+        """Returns the long lived connection for the current thread, opening it on first use"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            # isolation_level=None leaves transactions to transaction() instead of sqlite3 opening them implicitly
+            # The statement cache is sized to hold every registered query alongside the one-off schema statements
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=2 * len(self.QUERIES) + 32)
+            for pragma, value in self.profile.items():
+                connection.execute(f"PRAGMA {pragma} = {value}") # Values come from the fixed profile, never from user input
+            self.local.connection = connection
+            self.local.depth = 0 # How many transaction() blocks are currently open on this thread
+            self.local.teacher_version = None # data_version the teacher cache was last checked against on this thread
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """Runs the enclosed statements as one transaction, nested blocks join the outermost one"""
+        connection = self.get_connection()
         cursor = connection.cursor()
 
+        if self.local.depth == 0:
+            # Takes the write lock up front, a deferred BEGIN that reads first can't wait for it and fails with "database is locked"
+            cursor.execute("BEGIN IMMEDIATE")
+        self.local.depth += 1
+
+        try:
+            yield cursor
+        except BaseException:
+            self.local.depth -= 1
+            if self.local.depth == 0:
+                cursor.execute("ROLLBACK") # Undoes every change made inside the block
+            raise
+        else:
+            self.local.depth -= 1
+            if self.local.depth == 0:
+                cursor.execute("COMMIT")
+
+    def close(self):
+        """Closes every connection opened by any thread"""
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local() # Forces a fresh connection if the database is used again
+
+    def add_teacher(self, username, fullname, role, subject_department, current_covers, cover_limit):
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
         # Inserts teacher data
-        cursor.execute("""INSERT INTO Teachers VALUES (?, ?, ?, ?, ?, ?)""", (username, fullname, role, subject_department, current_covers, cover_limit))
-        connection.commit()
-        connection.close()
-
-    def get_fullname(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["add_teacher"], (username, fullname, role, subject_department, current_covers, cover_limit))
+        self.invalidate_teacher(username) # Replaces a cached "not found"
 
+    def get_teacher(self, username):
+        """Returns the TeacherRecord for a username, only querying the Teachers table on a cache miss"""
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        # Selects the fullname that matches the inputed username in the teachers table
-        cursor.execute("""SELECT Fullname FROM Teachers WHERE Username = ?""", (username,))
-        fullname = cursor.fetchone()
-        connection.close()
-        return fullname[0] if fullname else None # Returns the fullname or none if not found
+        version = self.data_version()
+        if version != self.local.teacher_version: # Another workstation has written since, so any cached teacher may be out of date
+            self.teacher_cache.clear()
+            self.local.teacher_version = version
+
+        if username in self.teacher_cache:
+            self.cache_hits += 1
+            return self.teacher_cache[username]
+
+        self.cache_misses += 1
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_teacher"], (username,))
+        row = cursor.fetchone()
+        record = TeacherRecord(*row) if row else None # Unknown usernames are cached as None too
+        self.teacher_cache[username] = record
+        return record
+
+    def data_version(self):
+        """Returns this thread's PRAGMA data_version, which changes whenever another connection commits to the file"""
+        cursor = self.get_connection().cursor()
+        cursor.execute("PRAGMA data_version")
+        return cursor.fetchone()[0]
+
+    def invalidate_teacher(self, username=None):
+        """Drops a teacher from the cache so the next lookup reads the database, or every teacher if none is given"""
+        if username is None:
+            self.teacher_cache.clear()
+        else:
+            if isinstance(username, tuple):
+                username = username[0] # Extracts the username if it's a tuple
+            self.teacher_cache.pop(username, None)
 
-    def get_role(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+    def cache_stats(self):
+        """Returns the teacher cache's hit and miss counters"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "size": len(self.teacher_cache)}
 
-        if isinstance(username, tuple):
-            username = username[0] # Extracts the username if it's a tuple
+    def get_fullname(self, username):
+        teacher = self.get_teacher(username) # Selects the teacher record that matches the inputed username
+        return teacher.fullname if teacher else None # Returns the fullname or none if not found
 
-        # Selects the role that is saved under the inputed username in the teachers table
-        cursor.execute("""SELECT Role FROM Teachers WHERE Username = ?""", (username,))
-        role = cursor.fetchone()
-        connection.close()
-        return role[0] if role else None # Returns the role or none if not found
+    def get_role(self, username):
+        teacher = self.get_teacher(username)
+        return teacher.role if teacher else None # Returns the role or none if not found
 
     def get_subject_department(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
-        if isinstance(username, tuple):
-            username = username[0] # Extracts the username if it's a tuple
-
-        # Selects the department that is saved under the inputed username in the teachers table
-        cursor.execute("""SELECT Subject_Department FROM Teachers WHERE Username = ?""", (username,))
-        subject_department = cursor.fetchone()
-        connection.close()
-        return subject_department[0] if subject_department else None # Return subject department or None if not found
+        teacher = self.get_teacher(username)
+        return teacher.subject_department if teacher else None # Return subject department or None if not found
     
     def get_cover_limit(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
-        if isinstance(username, tuple):
-            username = username[0] # Extracts the username if it's a tuple
-
-        # Selects the cover limit that is saved under the inputed username in the teachers table
-        cursor.execute("""SELECT Cover_Limit FROM Teachers WHERE Username = ?""", (username,))
-        cover_limit = cursor.fetchone()
-        connection.close()
-        return cover_limit[0] if cover_limit else None # Return the cover limit or None if not found
+        teacher = self.get_teacher(username)
+        return teacher.cover_limit if teacher else None # Return the cover limit or None if not found
 
     def get_current_covers(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
-        if isinstance(username, tuple):
-            username = username[0] # Extracts the username if it's a tuple
-
-        cursor.execute("""SELECT Current_Covers FROM Teachers WHERE Username = ?""", (username,))
-        current_covers = cursor.fetchone()
-        connection.close()
-        return current_covers[0] if current_covers else None # Return the current covers or None if not found
+        teacher = self.get_teacher(username)
+        return teacher.current_covers if teacher else None # Return the current covers or None if not found
 
     def increment_current_covers(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        current_covers = database.get_current_covers(username) # Gets the current covers
-        current_covers = current_covers + 1 # Increases/Increments the current covers by 1
-        cursor.execute("""UPDATE Teachers SET Current_Covers = ? WHERE Username = ?""", (current_covers, username)) # Updates the system with the new value
-        
-        connection.commit()
-        connection.close()
+        # Increments in SQL so two workstations allocating at once can't overwrite each other's count
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["increment_current_covers"], (username,))
+        self.invalidate_teacher(username)
     
     def reset_current_covers(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        current_covers = database.get_current_covers(username)
         current_covers = 0
-        cursor.execute("""UPDATE Teachers SET Current_Covers = ? WHERE Username = ?""", (current_covers, username)) # Resets current covers to 0
-        
-        connection.commit()
-        connection.close()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["set_current_covers"], (current_covers, username)) # Resets current covers to 0
+        self.invalidate_teacher(username)
+
+    def reset_all_current_covers(self):
+        """Resets every teacher's current covers to 0 with a single statement"""
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["reset_all_current_covers"])
+        self.invalidate_teacher()
+
+    def get_setting(self, name):
+        """Returns a value from the Settings table, or None if it has never been set"""
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_setting"], (name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def legacy_reset_period(self):
+        """Works out the last month covers were reset from state.txt, which older versions rewrote every time they started"""
+        today = datetime.date.today()
+        path = os.path.join(os.path.dirname(self.path), "state.txt")
+        if not os.path.exists(path): # A new install has nothing to catch up on
+            return today.strftime("%Y-%m")
+
+        written = datetime.date.fromtimestamp(os.path.getmtime(path))
+        f = open(path, "r")
+        cleared = f.read().strip()
+        f.close()
+        if cleared == "True": # Only written when started on the 1st, which reset that month
+            return written.strftime("%Y-%m")
+
+        # Not known to have been reset this month, so the first check resets it
+        last_month = today.replace(day=1) - datetime.timedelta(days=1)
+        return last_month.strftime("%Y-%m")
+
+    def reset_covers_for_period(self, date):
+        """Resets every teacher's current covers the first time it's called in a new month, returns whether it did"""
+        period = date.strftime("%Y-%m")
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["add_setting"], ("Last_Cover_Reset", period))
+            cursor.execute(self.QUERIES["advance_setting"], (period, "Last_Cover_Reset", period))
+            if cursor.rowcount == 0: # Already reset this month
+                return False
+            cursor.execute(self.QUERIES["reset_all_current_covers"])
+        self.invalidate_teacher()
+        return True
 
     def add_lesson(self, username, day, lesson_number, subject, class_name, substitute):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        if isinstance(username, tuple):
+            username = username[0] # Extracts the username if it's a tuple
+
+        # Insert lesson into the Lessons table under the given day
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["add_lesson"], (username, day, lesson_number, subject, class_name, substitute))
 
+    def add_week(self, username, grid):
+        """Adds a whole week of lessons in one transaction, grid maps each day to its (subject, class, substitute) lessons in order"""
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        # Insert lesson into the appropriate day's table
-        if day == "Monday":
-            cursor.execute("""INSERT INTO MondayLessons (Username, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?)""", (username, lesson_number, subject, class_name, substitute))
-        elif day == "Tuesday":
-            cursor.execute("""INSERT INTO TuesdayLessons (Username, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?)""", (username, lesson_number, subject, class_name, substitute))
-        elif day == "Wednesday":
-            cursor.execute("""INSERT INTO WednesdayLessons (Username, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?)""", (username, lesson_number, subject, class_name, substitute))
-        elif day == "Thursday":
-            cursor.execute("""INSERT INTO ThursdayLessons (Username, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?)""", (username, lesson_number, subject, class_name, substitute))
-        elif day == "Friday":
-            cursor.execute("""INSERT INTO FridayLessons (Username, Lesson_Number, Subject, Class, Substitute) VALUES (?, ?, ?, ?, ?)""", (username, lesson_number, subject, class_name, substitute))
-
-        connection.commit()
-        connection.close()
+        rows = [(username, day, lesson_number, subject, class_name, substitute)
+                for day, lessons in grid.items()
+                for lesson_number, (subject, class_name, substitute) in enumerate(lessons, start=1)]
+
+        with self.transaction() as cursor:
+            cursor.executemany(self.QUERIES["add_lesson"], rows)
 
     def edit_lesson(self, username, day, lesson_number, subject, class_name, substitute):
         """Edit an existing lesson for a teacher"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        if isinstance(username, tuple):
+            username = username[0] # Extracts the username if it's a tuple
+
+        # Updates the lesson for the given day
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["edit_lesson"], (subject, class_name, substitute, username, day, lesson_number))
+
+    def apply_cover_assignments(self, assignments, date, unfilled=()):
+        """Writes every cover from an allocation run in a single transaction so a run is all or nothing"""
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date # Formats date
+        rows = [] # One CoverAssignments row per cover needing lesson
+        added_covers = {} # Number of new covers per covering teacher
+        dropped_covers = {} # Number of replaced covers per teacher who was giving them
+
+        for absent_teacher, cover_teacher, day, lesson_num, subject, class_name, absent_teacher_name in assignments:
+            rows.append((date_str, day, lesson_num, absent_teacher, cover_teacher, "Active"))
+            added_covers[cover_teacher] = added_covers.get(cover_teacher, 0) + 1
+        for absent_teacher, day, lesson_num in unfilled: # Lessons nobody was free for, replaced if a later run covers them
+            rows.append((date_str, day, lesson_num, absent_teacher, None, "Unfilled"))
+
+        with self.transaction() as cursor:
+            # A row already Active for the same lesson is replaced, so the teacher who was giving that cover has it taken back
+            for row in rows:
+                cursor.execute(self.QUERIES["get_active_cover"], (row[0], row[2], row[3]))
+                for (cover_teacher,) in cursor.fetchall():
+                    dropped_covers[cover_teacher] = dropped_covers.get(cover_teacher, 0) + 1
+            cursor.executemany(self.QUERIES["add_assignment"], rows)
+            cursor.executemany(self.QUERIES["add_current_covers"],
+                               [(count, teacher) for teacher, count in added_covers.items()] +
+                               [(-count, teacher) for teacher, count in dropped_covers.items()])
+        for teacher in set(added_covers) | set(dropped_covers):
+            self.invalidate_teacher(teacher)
+        if self.cover_windows is not None: # Counted once the transaction has committed
+            for teacher, count in added_covers.items():
+                self.cover_windows.add(teacher, datetime.date.fromisoformat(date_str), count)
+            for teacher, count in dropped_covers.items():
+                self.cover_windows.remove(teacher, datetime.date.fromisoformat(date_str), count)
+
+    def get_covers_given(self, username, date):
+        """Returns (lesson number, absent teacher) of every active cover a teacher is giving on a date"""
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_covers_given"], (username, date_str)) # Uses the CoverAssignments_Cover index
+        return cursor.fetchall()
+
+    def get_cover_windows(self, date):
+        """Returns the rolling cover counts moved on to a date, reading the last term of covers again only if another connection has written"""
+        date = date.date() if isinstance(date, datetime.datetime) else date
+        cursor = self.get_connection().cursor()
+        version = self.data_version() # Changes when any other connection, like another workstation, commits to the file
+
+        # Windows only move forward, so an earlier date reads them again too
+        if self.cover_windows is None or version != self.cover_windows_version or date < self.cover_windows.date:
+            self.cover_windows = CoverWindows(date)
+            self.cover_windows_version = version
+            start = date - datetime.timedelta(days=max(CoverWindows.WINDOWS.values()))
+            cursor.execute(self.QUERIES["count_covers_by_date"], (start.strftime("%Y-%m-%d"),)) # Uses the CoverAssignments_Date index
+            for date_str, teacher, count in cursor.fetchall():
+                self.cover_windows.add(teacher, datetime.date.fromisoformat(date_str), count)
+        else:
+            self.cover_windows.advance(date)
+        return self.cover_windows
+
+    def get_cover_counts(self, start_date, end_date=None):
+        """Returns how many covers each teacher took between two dates (inclusive) from CoverAssignments"""
+        cursor = self.get_connection().cursor()
+        start_str = start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime.date) else start_date
+        end_str = end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime.date) else end_date
 
+        if end_str is None:
+            cursor.execute(self.QUERIES["count_covers_since"], (start_str,))
+        else:
+            cursor.execute(self.QUERIES["count_covers_between"], (start_str, end_str))
+        return dict(cursor.fetchall())
+
+    def get_cover_report(self, start_date, end_date):
+        """Returns a cursor over every teacher's covers taken, covers needed and unfilled lessons between two dates (inclusive)"""
+        start_str = start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime.date) else start_date
+        end_str = end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime.date) else end_date
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_cover_report"], (start_str, end_str, start_str, end_str))
+        return cursor # Not fetched, so a report can be written a row at a time
+
+    def start_run_covers(self):
+        """Makes an empty temporary table for the covers chosen during an allocation run that haven't been saved yet"""
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["create_run_covers"]) # Temporary tables belong to this thread's connection only
+        cursor.execute(self.QUERIES["index_run_covers"])
+        cursor.execute(self.QUERIES["clear_run_covers"])
+
+    def add_run_covers(self, covers):
+        """Records (username, lesson number) covers chosen so far in the run"""
+        cursor = self.get_connection().cursor()
+        cursor.executemany(self.QUERIES["add_run_cover"], covers)
+
+    def get_class_covers(self, class_name, date):
+        """Returns (lesson number, cover username, absent username, status) for each of a class's lessons needing cover on a date"""
+        cursor = self.get_connection().cursor()
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date
+
+        cursor.execute(self.QUERIES["get_class_covers"], (date_str, class_name)) # Uses the CoverAssignments_Date index
+        return cursor.fetchall()
+
+    def get_cover_history(self, username):
+        """Returns (date, day, lesson number, absent username, status) for every cover a teacher has been given"""
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        # Updates lesson in the appropriate day's table
-        if day == "Monday":
-            cursor.execute("""UPDATE MondayLessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Lesson_Number = ?""", (subject, class_name, substitute, username, lesson_number))
-        elif day == "Tuesday":
-            cursor.execute("""UPDATE TuesdayLessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Lesson_Number = ?""", (subject, class_name, substitute, username, lesson_number))
-        elif day == "Wednesday":
-            cursor.execute("""UPDATE WednesdayLessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Lesson_Number = ?""", (subject, class_name, substitute, username, lesson_number))
-        elif day == "Thursday":
-            cursor.execute("""UPDATE ThursdayLessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Lesson_Number = ?""", (subject, class_name, substitute, username, lesson_number))
-        elif day == "Friday":
-            cursor.execute("""UPDATE FridayLessons SET Subject = ?, Class = ?, Substitute = ? WHERE Username = ? AND Lesson_Number = ?""", (subject, class_name, substitute, username, lesson_number))
-
-        connection.commit()
-        connection.close()
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_cover_history"], (username,)) # Uses the CoverAssignments_Cover index
+        return cursor.fetchall()
+
+    def get_free_candidates(self, day, lesson_num, date):
+        """Returns (username, department, covers, cover limit) for every present teacher free at a lesson number, lowest load first"""
+        cursor = self.get_connection().cursor()
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date
+
+        cursor.execute(self.QUERIES["get_free_candidates"], (day, lesson_num, date_str, date_str))
+        return cursor.fetchall()
+
+    def query_plan(self, name, parameters):
+        """Returns the EXPLAIN QUERY PLAN details of a registered query"""
+        cursor = self.get_connection().cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + self.QUERIES[name], parameters)
+        return [row[3] for row in cursor.fetchall()]
+
+    def revert_covers(self, date):
+        """Ends every cover dated on or before date in one transaction, returns how many rows changed"""
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date
+
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["complete_assignments"], (date_str,)) # Covers planned for later dates stay Active
+            return cursor.rowcount
 
     def get_all_teachers(self):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-        cursor.execute("""SELECT * FROM Teachers""") # Query for all teachers
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_all_teachers"]) # Query for all teachers
         teachers = cursor.fetchall() # Fetches all the results
-        connection.close()
 
         return teachers # Returns the list of teachers
     
     def get_all_usernames(self):
         """Retrieves all usernames rom the Teachers table"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-        cursor.execute("""SELECT Username FROM Teachers""") # Query for all usernames
+        cursor = self.get_connection().cursor()
+        cursor.execute(self.QUERIES["get_all_usernames"]) # Query for all usernames
         usernames = cursor.fetchall()
-        connection.close()
 
         return usernames #Returns the list of usernames
 
     def get_all_lessons(self, username, day):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        cursor = self.get_connection().cursor()
         lessons = [] # Initializes an empty list to contain lessons
         
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        # Query based on inputed day of the week
-        if day == "Monday":
-            cursor.execute("""SELECT * FROM MondayLessons WHERE Username = ?""", (username,))
-        elif day == "Tuesday":
-            cursor.execute("""SELECT * FROM TuesdayLessons WHERE Username = ?""", (username,))
-        elif day == "Wednesday":
-            cursor.execute("""SELECT * FROM WednesdayLessons WHERE Username = ?""", (username,))
-        elif day == "Thursday":
-            cursor.execute("""SELECT * FROM ThursdayLessons WHERE Username = ?""", (username,))
-        elif day == "Friday":
-            cursor.execute("""SELECT * FROM FridayLessons WHERE Username = ?""", (username,))
+        # Query based on inputed day of the week, columns kept in the order the screens index them
+        cursor.execute(self.QUERIES["get_all_lessons"], (username, day))
 
         lessons = cursor.fetchall() # Fetches all results
-        connection.close()
         return lessons # Returns the list of lessons
 
     def get_one_lesson(self, username, day, lesson_num):
         """Retrieves a specific lesson for a teacher on a specific day"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        cursor = self.get_connection().cursor()
         
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        cursor.execute(f"""SELECT * FROM {day}Lessons WHERE Username = ? AND Lesson_Number =?""", (username, lesson_num))
+        cursor.execute(self.QUERIES["get_one_lesson"], (username, day, lesson_num))
 
         lesson = cursor.fetchone()
-        connection.close()
 
         return lesson # Return the lesson details
-    
-    def delete_teacher_user(self, username):
-        """Delete a teacher from the database based on their username"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+
+    def get_week_lessons(self, username):
+        """Retrieves a teacher's whole week in one query as a dictionary of day to lessons"""
+        cursor = self.get_connection().cursor()
 
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        cursor.execute("""DELETE FROM Teachers WHERE Username = ?""", (username,)) # Delete the teacher's record and details from the system
+        week = {day: [] for day in self.DAYS} # Every day is present even if the teacher has no lessons on it
+        cursor.execute(self.QUERIES["get_week_lessons"], (username,))
+        for row in cursor.fetchall():
+            week[row[0]].append(row[1:]) # Same shape as get_all_lessons
 
-        connection.commit()
-        connection.close()
+        return week
 
-    def delete_teacher_data(self, username):
-        """Delete all lesson data for a teacher based on their username"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+    def load_day_snapshot(self, date):
+        """Loads every teacher's lessons and covers for a date in one query and returns them as a DaySnapshot"""
+        cursor = self.get_connection().cursor()
+        day = date.strftime('%A')
+        date_str = date.strftime("%Y-%m-%d")
+        snapshot = DaySnapshot(day)
 
+        cursor.execute(self.QUERIES["get_date_lessons"], (date_str, date_str, day))
+        for lesson in cursor.fetchall():
+            snapshot.lessons.setdefault(lesson[0], {})[lesson[1]] = lesson # Keyed by teacher then lesson number
+
+        # Fresh records rather than cached ones, since the run changes current covers before they are saved
+        cursor.execute(self.QUERIES["get_teacher_records"])
+        for teacher in cursor.fetchall():
+            snapshot.teachers[teacher[0]] = TeacherRecord(*teacher)
+
+        return snapshot
+
+    def delete_teacher_user(self, username):
+        """Delete a teacher from the database based on their username"""
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        # Delete lessons for each day of the week
-        cursor.execute("""DELETE FROM MondayLessons WHERE Username = ?""", (username,))
-        cursor.execute("""DELETE FROM TuesdayLessons WHERE Username = ?""", (username,))
-        cursor.execute("""DELETE FROM WednesdayLessons WHERE Username = ?""", (username,))
-        cursor.execute("""DELETE FROM ThursdayLessons WHERE Username = ?""", (username,))
-        cursor.execute("""DELETE FROM FridayLessons WHERE Username = ?""", (username,))
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["delete_teacher_user"], (username,)) # Delete the teacher's record and details from the system
+        self.invalidate_teacher(username)
+
+    def delete_teacher_data(self, username):
+        """Delete all lesson data for a teacher based on their username"""
+        if isinstance(username, tuple):
+            username = username[0] # Extracts the username if it's a tuple
 
-        connection.commit()
-        connection.close()
+        # Delete lessons for every day of the week
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["delete_teacher_data"], (username,))
 
     def add_absence(self, username, date, reason):
         """Logs an absence of a teacher"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
         date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date # Formats data into an appropriate format
 
-        cursor.execute("""INSERT INTO AbsenceLog (Username, Date, Reason) VALUES (?, ?, ?)""", (username, date_str, reason)) # Logs the absence in the databasse
-        connection.commit()
-        connection.close()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["add_absence"], (username, date_str, reason)) # Logs the absence in the databasse
 
     def delete_absence(self):
         """Delete absence records for all teachers for the current date (Only for testing purposes)"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
-        teachers = self.get_all_usernames() # Gets all the usernames
         date = datetime.datetime.now().strftime('%Y-%m-%d') # Gets today's date
 
-        for teacher in teachers:
-            teacher = teacher[0] # Extract username from list 
-            cursor.execute("""DELETE FROM AbsenceLog WHERE Username = ? and Date = ?""", (teacher, date)) # Deletes the absence
-
-        connection.commit()
-        connection.close()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["delete_absence"], (date,)) # Deletes every absence on the date through the AbsenceLog_Date index
 
     def is_absent(self, username, date):
         """Check if a teacher is absent on a specific date"""
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        cursor = self.get_connection().cursor()
 
         date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date # Formats date
 
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        cursor.execute("""SELECT * FROM AbsenceLog WHERE Username = ? AND Date = ?""", (username, date_str)) # Checks if a record of the absence is present
+        cursor.execute(self.QUERIES["is_absent"], (username, date_str)) # Checks if a record of the absence is present
         return True if cursor.fetchone() is not None else False # Returns True if the teacher is absent, otherwise returns False
 
+    def get_absent_on(self, date):
+        """Returns the set of usernames marked absent on a date in one query"""
+        cursor = self.get_connection().cursor()
+
+        date_str = date.strftime("%Y-%m-%d") if isinstance(date, datetime.date) else date # Formats date
+
+        cursor.execute(self.QUERIES["get_absent_on"], (date_str,)) # Uses the AbsenceLog_Date index
+        return {row[0] for row in cursor.fetchall()}
+
     def generate_salt(self):
         """Generate a random 16 byte salt for password hashing"""
         length = 16 # Length of the salt
@@ -608,52 +949,40 @@ class Database:
         salt = self.generate_salt() # Generates a salt
         hash_value = self.hashing_algorithm(password, salt) # Hashes the password without ever saving it
 
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
         #Stores the hash value and generated salt under the username in the hashing table
-        cursor.execute("""INSERT INTO Hashing (Username, Salt, Hash_Value) VALUES (?, ?, ?)""", (username, salt, hash_value))
-        connection.commit()
-        connection.close()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["store_password"], (username, salt, hash_value))
     
     def delete_password(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
-
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
-        cursor.execute("""DELETE FROM Hashing WHERE Username = ?""",(username,)) # Delete all hashing/password details from the system
-        connection.commit()
-        connection.close()
+        with self.transaction() as cursor:
+            cursor.execute(self.QUERIES["delete_password"],(username,)) # Delete all hashing/password details from the system
 
     def get_hash(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        cursor = self.get_connection().cursor()
 
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
         # Query for hash value based on username
-        cursor.execute("""SELECT Hash_Value FROM Hashing WHERE Username = ?""", (username,))
+        cursor.execute(self.QUERIES["get_hash"], (username,))
         hash = cursor.fetchone()
-        connection.close()
         return hash[0] if hash else None # Returns hash value or None if not found
 
     def get_salt(self, username):
-        connection = sqlite3.connect('MyTimetable.db')
-        cursor = connection.cursor()
+        cursor = self.get_connection().cursor()
 
         if isinstance(username, tuple):
             username = username[0] # Extracts the username if it's a tuple
 
         #Query for salt
-        cursor.execute("""SELECT Salt FROM Hashing WHERE Username = ?""", (username,))
+        cursor.execute(self.QUERIES["get_salt"], (username,))
         salt = cursor.fetchone()
-        connection.close()
         return salt[0] if salt else None # Returns salt or None if not found
 
     def verify_password(self, username, password):
@@ -667,6 +996,428 @@ class Database:
         else:
             return False # Return false since password don't match
 
+class TeacherRecord:
+    """One row of the Teachers table, slotted since the cache keeps one per teacher"""
+
+    __slots__ = ("username", "fullname", "role", "subject_department", "current_covers", "cover_limit")
+
+    def __init__(self, username, fullname, role, subject_department, current_covers, cover_limit):
+        self.username = username
+        self.fullname = fullname
+        self.role = role
+        self.subject_department = subject_department
+        self.current_covers = current_covers
+        self.cover_limit = cover_limit
+
+    def cover_percentage(self, covers=None):
+        """Returns how much of the cover limit is used, or None if the limit is 0 or blank so the teacher can't take covers"""
+        if not isinstance(self.cover_limit, int) or self.cover_limit <= 0:
+            return None
+        covers = self.current_covers if covers is None else covers
+        return (covers / self.cover_limit) * 100
+
+class DaySnapshot:
+    """In memory copy of one day's timetable and teacher details used by the cover allocation"""
+
+    def __init__(self, day):
+        self.day = day # Day of the week the snapshot was taken for
+        self.lessons = {} # Username -> {Lesson_Number -> (Username, Lesson_Number, Subject, Class, Substitute)}
+        self.teachers = {} # Username -> TeacherRecord
+
+    def copy(self):
+        """Returns an independent copy that a simulation can change freely"""
+        snapshot = DaySnapshot(self.day)
+        snapshot.lessons = {username: dict(lessons) for username, lessons in self.lessons.items()} # Rows are tuples so can be shared
+        snapshot.teachers = {username: TeacherRecord(record.username, record.fullname, record.role, record.subject_department,
+                                                     record.current_covers, record.cover_limit)
+                             for username, record in self.teachers.items()}
+        return snapshot
+
+    def get_lesson(self, username, lesson_num):
+        """Returns a teacher's lesson at a lesson number or None if they have no lesson stored there"""
+        return self.lessons.get(username, {}).get(lesson_num)
+
+    def set_lesson(self, username, lesson_num, subject, class_name, substitute):
+        """Updates the in memory lesson so later lookups in the same run see the change"""
+        self.lessons.setdefault(username, {})[lesson_num] = (username, lesson_num, subject, class_name, substitute)
+
+    def add_cover(self, username):
+        """Counts a new cover against a teacher"""
+        self.teachers[username].current_covers += 1
+
+class AvailabilityIndex:
+    """Which teachers are free at each lesson number of a day, built once per allocation run"""
+
+    def __init__(self, snapshot, teachers):
+        self.order = {teacher: position for position, teacher in enumerate(teachers)} # Username -> position, keeps picks in the teachers' stored order
+        self.free = {} # Lesson_Number -> set of usernames free at that lesson
+        self.departments = {} # Subject_Department -> set of usernames
+
+        for teacher in teachers:
+            if snapshot.teachers[teacher].cover_percentage() is None: # Teachers with a 0 or blank cover limit are never offered covers
+                continue
+            for lesson_num, lesson in snapshot.lessons.get(teacher, {}).items():
+                if lesson[2] == "Free":
+                    self.free.setdefault(lesson_num, set()).add(teacher)
+            self.departments.setdefault(snapshot.teachers[teacher].subject_department, set()).add(teacher)
+
+    def free_at(self, lesson_num):
+        """Returns the set of teachers free at a lesson number"""
+        return self.free.get(lesson_num, set())
+
+    def free_in_department(self, lesson_num, department):
+        """Returns the teachers free at a lesson number who are in the given department"""
+        return self.free_at(lesson_num) & self.departments.get(department, set())
+
+    def take(self, teacher, lesson_num):
+        """Marks a teacher as no longer free at a lesson number once they are given a cover"""
+        self.free_at(lesson_num).discard(teacher)
+
+    def in_order(self, teachers):
+        """Returns the teachers sorted into their stored order"""
+        return sorted(teachers, key=self.order.__getitem__)
+
+class CoverHeaps:
+    """Min-heaps of free teachers keyed on cover percentage, one per lesson number and department"""
+
+    def __init__(self, availability, teachers, rng):
+        self.availability = availability # AvailabilityIndex the heaps draw their free teachers from
+        self.teachers = teachers # Username -> TeacherRecord, cover counts are kept up to date by the snapshot
+        self.random = rng # Seeded random used for the tie break keys
+        self.department_heaps = {} # (Lesson_Number, Subject_Department) -> heap of (percentage, tie break, username)
+        self.period_heaps = {} # Lesson_Number -> heap of every free teacher
+        self.lesson_num = None # Lesson number the heaps are currently held for
+        self.stats = {"pools_built": 0, "pool_reuses": 0, "picks": 0, "rekeyed": 0, "discarded": 0} # Counts shown by the benchmarks
+
+    def use_lesson_num(self, lesson_num):
+        """Drops the previous lesson number's heaps once the run moves on, since lessons are handled a lesson number at a time"""
+        if lesson_num != self.lesson_num:
+            self.department_heaps.clear()
+            self.period_heaps.clear()
+            self.lesson_num = lesson_num
+
+    def percentage(self, teacher):
+        """Returns how much of a teacher's cover limit has been used"""
+        return self.teachers[teacher].cover_percentage()
+
+    def build(self, teachers):
+        """Makes a heap from a set of teachers, each given a random tie break key"""
+        heap = [(self.percentage(teacher), self.random.random(), teacher) for teacher in self.availability.in_order(teachers)]
+        heapq.heapify(heap)
+        self.stats["pools_built"] += 1
+        return heap
+
+    def pick(self, heap, lesson_num):
+        """Returns the free teacher with the lowest cover percentage on a heap, or None if nobody is left"""
+        free = self.availability.free_at(lesson_num)
+        while heap:
+            percentage, tie_break, teacher = heap[0]
+            if teacher not in free: # Already given a cover at this lesson number
+                heapq.heappop(heap)
+                self.stats["discarded"] += 1
+            elif percentage != self.percentage(teacher): # Took a cover at another lesson number since being pushed, re-keys them
+                heapq.heapreplace(heap, (self.percentage(teacher), self.random.random(), teacher))
+                self.stats["rekeyed"] += 1
+            else:
+                self.stats["picks"] += 1
+                return teacher
+        return None
+
+    def lowest_in_department(self, lesson_num, department):
+        """Returns the least loaded teacher free at a lesson number in a department"""
+        self.use_lesson_num(lesson_num)
+        key = (lesson_num, department)
+        if key not in self.department_heaps: # Heaps are only built the first time they're needed
+            self.department_heaps[key] = self.build(self.availability.free_in_department(lesson_num, department))
+        else:
+            self.stats["pool_reuses"] += 1
+        return self.pick(self.department_heaps[key], lesson_num)
+
+    def lowest(self, lesson_num):
+        """Returns the least loaded teacher free at a lesson number in any department"""
+        self.use_lesson_num(lesson_num)
+        if lesson_num not in self.period_heaps:
+            self.period_heaps[lesson_num] = self.build(self.availability.free_at(lesson_num))
+        else:
+            self.stats["pool_reuses"] += 1
+        return self.pick(self.period_heaps[lesson_num], lesson_num)
+
+class CoverFlow:
+    """Plans a whole day's covers at once as a min-cost flow, so an early lesson can't take the only teacher a later lesson needed"""
+
+    # Cost weights, covering as many lessons as possible always comes first
+    OVER_LIMIT_COST = 100000 # Going over a cover limit, only done when there's no other way to cover the lesson
+    OTHER_DEPARTMENT_COST = 1000 # Using a teacher from outside the absent teacher's department
+
+    def __init__(self, snapshot, availability, lessons):
+        self.snapshot = snapshot # DaySnapshot the plan is made from
+        self.availability = availability # AvailabilityIndex of the teachers free at each lesson number
+        self.lessons = lessons # Cover needing lessons as (Username, Lesson_Number, Subject, Class, Substitute)
+        self.edges = [] # Node -> list of the edge numbers leaving it
+        self.to = [] # Edge -> node it goes to, edge e ^ 1 is always the reverse of edge e
+        self.capacity = [] # Edge -> capacity left
+        self.cost = [] # Edge -> cost of one unit of flow
+
+    def add_node(self):
+        """Adds a node to the graph and returns its number"""
+        self.edges.append([])
+        return len(self.edges) - 1
+
+    def add_edge(self, start, end, capacity, cost):
+        """Adds an edge and its empty reverse edge, returns the edge's number"""
+        for node, other, edge_capacity, edge_cost in ((start, end, capacity, cost), (end, start, 0, -cost)):
+            self.edges[node].append(len(self.to))
+            self.to.append(other)
+            self.capacity.append(edge_capacity)
+            self.cost.append(edge_cost)
+        return len(self.to) - 2
+
+    def solve(self):
+        """Returns lesson position -> teacher for every cover needing lesson the plan fills"""
+        source = self.add_node()
+        sink = self.add_node()
+
+        # Lessons at the same lesson number from the same department are interchangeable so they share a node
+        groups = {} # (Lesson_Number, Subject_Department) -> positions of the lessons in self.lessons
+        for position, lesson in enumerate(self.lessons):
+            department = self.snapshot.teachers[lesson[0]].subject_department
+            groups.setdefault((lesson[1], department), []).append(position)
+
+        slots = {} # (Username, Lesson_Number) -> node allowing one cover per free lesson
+        teacher_nodes = {} # Username -> node collecting all of a teacher's covers
+        slot_counts = {} # Username -> number of free lessons they could cover
+        group_edges = [] # (group, edge, teacher) for reading the plan back
+        for (lesson_num, department), positions in groups.items():
+            group = self.add_node()
+            self.add_edge(source, group, len(positions), 0)
+            for teacher in self.availability.in_order(self.availability.free_at(lesson_num)):
+                if (teacher, lesson_num) not in slots:
+                    slots[(teacher, lesson_num)] = self.add_node()
+                    if teacher not in teacher_nodes:
+                        teacher_nodes[teacher] = self.add_node()
+                    self.add_edge(slots[(teacher, lesson_num)], teacher_nodes[teacher], 1, 0)
+                    slot_counts[teacher] = slot_counts.get(teacher, 0) + 1
+                cost = 0 if self.snapshot.teachers[teacher].subject_department == department else self.OTHER_DEPARTMENT_COST
+                group_edges.append(((lesson_num, department), self.add_edge(group, slots[(teacher, lesson_num)], 1, cost), teacher))
+
+        # Each extra cover is its own edge costing the percentage it takes the teacher to, so covers are spread out
+        for teacher, node in teacher_nodes.items():
+            record = self.snapshot.teachers[teacher]
+            for extra in range(1, slot_counts[teacher] + 1):
+                cost = int(record.cover_percentage(record.current_covers + extra))
+                if record.current_covers + extra > record.cover_limit:
+                    cost += self.OVER_LIMIT_COST
+                self.add_edge(node, sink, 1, cost)
+
+        self.send_flow(source, sink)
+
+        chosen = {}
+        for group, edge, teacher in group_edges:
+            if self.capacity[edge] == 0: # The edge was used so the teacher covers one of the group's lessons
+                chosen[groups[group].pop(0)] = teacher
+        return chosen
+
+    def send_flow(self, source, sink):
+        """Sends as much flow as possible from source to sink, always along the cheapest path left"""
+        potential = [0] * len(self.edges) # Keeps every cost non negative so Dijkstra can be used after reverse edges appear
+        while True:
+            distance = [None] * len(self.edges)
+            previous = [None] * len(self.edges) # Node -> edge used to reach it
+            distance[source] = 0
+            queue = [(0, source)]
+            while queue:
+                node_distance, node = heapq.heappop(queue)
+                if node_distance > distance[node]:
+                    continue
+                if node == sink: # Stops as soon as the cheapest path to the sink is known
+                    break
+                for edge in self.edges[node]:
+                    if self.capacity[edge] > 0:
+                        end = self.to[edge]
+                        new_distance = node_distance + self.cost[edge] + potential[node] - potential[end]
+                        if distance[end] is None or new_distance < distance[end]:
+                            distance[end] = new_distance
+                            previous[end] = edge
+                            heapq.heappush(queue, (new_distance, end))
+
+            if distance[sink] is None: # No more lessons can be covered
+                return
+
+            furthest = distance[sink]
+            for node in range(len(self.edges)):
+                potential[node] += furthest if distance[node] is None else min(distance[node], furthest)
+
+            amount = None # Finds how much can be sent along the path
+            node = sink
+            while node != source:
+                edge = previous[node]
+                amount = self.capacity[edge] if amount is None else min(amount, self.capacity[edge])
+                node = self.to[edge ^ 1]
+            node = sink
+            while node != source:
+                edge = previous[node]
+                self.capacity[edge] -= amount
+                self.capacity[edge ^ 1] += amount
+                node = self.to[edge ^ 1]
+
+class CoverArrays:
+    """The day held in NumPy arrays so every lesson at a lesson number is scored against every teacher at once"""
+
+    def __init__(self, snapshot, teachers):
+        self.teachers = list(teachers) # Row -> username
+        periods = max((lesson_num for lessons in snapshot.lessons.values() for lesson_num in lessons), default=0) + 1
+        records = [snapshot.teachers[teacher] for teacher in self.teachers]
+
+        self.free = np.zeros((len(self.teachers), periods), dtype=bool) # Teacher x lesson number, True where the teacher is free
+        for row, teacher in enumerate(self.teachers):
+            for lesson_num, lesson in snapshot.lessons.get(teacher, {}).items():
+                self.free[row, lesson_num] = lesson[2] == "Free"
+
+        self.department_codes = {} # Subject_Department -> code used in the arrays
+        self.departments = np.array([self.department_codes.setdefault(record.subject_department, len(self.department_codes)) for record in records], dtype=int)
+        self.current = np.array([record.current_covers for record in records], dtype=float)
+        self.limit = np.array([record.cover_limit if record.cover_percentage() is not None else 0 for record in records], dtype=float)
+        self.free &= (self.limit > 0)[:, None] # Teachers with a 0 or blank cover limit are masked out rather than divided by
+
+    def percentages(self):
+        """Returns every teacher's cover percentage, infinite where the limit is masked"""
+        percentages = np.full(len(self.teachers), np.inf)
+        np.divide(self.current, self.limit, out=percentages, where=self.limit > 0)
+        return percentages * 100
+
+    def allocate(self, lesson_num, departments, rng):
+        """Chooses a teacher for each lesson at a lesson number given the absent teachers' departments, None where nobody is free"""
+        free = self.free[:, lesson_num] # A view, so teachers marked busy here stay busy in self.free
+        codes = np.array([self.department_codes.get(department, -1) for department in departments], dtype=int)
+        same_department = codes[:, None] == self.departments[None, :] # Lesson x teacher mask for the whole lesson number
+        percentages = self.percentages() # Only the chosen teachers change and they can't be chosen twice at one lesson number
+
+        chosen = []
+        for mask in same_department:
+            candidates = mask & free
+            if not candidates.any(): # Falls back to every free teacher if nobody in the department is free
+                candidates = free
+            if not candidates.any():
+                chosen.append(None)
+                continue
+            scores = np.where(candidates, percentages, np.inf)
+            lowest = np.flatnonzero(scores == scores.min())
+            row = int(lowest[rng.randrange(len(lowest))]) # Randomly selects between equally loaded teachers
+            free[row] = False
+            self.current[row] += 1
+            chosen.append(self.teachers[row])
+        return chosen
+
+    def plan(self, snapshot, lessons, rng):
+        """Returns lesson position -> teacher, working through the lesson numbers in order"""
+        by_lesson_num = {} # Lesson_Number -> positions of the lessons in it
+        for position, lesson in enumerate(lessons):
+            by_lesson_num.setdefault(lesson[1], []).append(position)
+
+        planned = {}
+        for lesson_num in sorted(by_lesson_num):
+            positions = by_lesson_num[lesson_num]
+            departments = [snapshot.teachers[lessons[position][0]].subject_department for position in positions]
+            for position, teacher in zip(positions, self.allocate(lesson_num, departments, rng)):
+                if teacher is not None:
+                    planned[position] = teacher
+        return planned
+
+class SqlCandidates:
+    """Finds cover candidates inside SQLite with one query per lesson number instead of filtering the snapshot in Python"""
+
+    def __init__(self, day, date, present):
+        self.day = day # Day of the week being allocated
+        self.date = date # Date absences are checked against
+        self.present = set(present) # Teachers the run treats as present, also covers simulated absences the AbsenceLog doesn't know about
+
+    def plan(self, snapshot, lessons, rng):
+        """Returns lesson position -> teacher, working through the lesson numbers in order"""
+        database.start_run_covers()
+
+        by_lesson_num = {} # Lesson_Number -> positions of the lessons in it
+        for position, lesson in enumerate(lessons):
+            by_lesson_num.setdefault(lesson[1], []).append(position)
+
+        planned = {}
+        for lesson_num in sorted(by_lesson_num):
+            # Ordered by load, covers chosen at earlier lesson numbers are counted through the temporary table
+            candidates = [candidate for candidate in database.get_free_candidates(self.day, lesson_num, self.date) if candidate[0] in self.present]
+            departments = {} # Subject_Department -> that department's candidates, still in load order
+            for candidate in candidates:
+                departments.setdefault(candidate[1], []).append(candidate)
+
+            taken = set()
+            for position in by_lesson_num[lesson_num]:
+                department = snapshot.teachers[lessons[position][0]].subject_department
+                # Same department teachers if there are any, otherwise every free teacher
+                teacher = self.lowest(departments.get(department, []), taken, rng) or self.lowest(candidates, taken, rng)
+                if teacher is not None:
+                    taken.add(teacher)
+                    planned[position] = teacher
+            database.add_run_covers([(teacher, lesson_num) for teacher in taken])
+        return planned
+
+    def lowest(self, candidates, taken, rng):
+        """Randomly picks between the least loaded candidates not already taken, the list being in load order"""
+        ties = []
+        lowest_ratio = None
+        for username, department, covers, limit in candidates:
+            if username in taken:
+                continue
+            if lowest_ratio is None:
+                lowest_ratio = covers / limit
+            elif covers / limit != lowest_ratio: # Past the least loaded candidates
+                break
+            ties.append(username)
+        return rng.choice(ties) if ties else None
+
+class CoverWindows:
+    """Rolling counts of each teacher's covers over the last week, month and term, updated as covers are added"""
+
+    WINDOWS = {"week": 7, "month": 30, "term": 91} # Window name -> length in days, each ending on the current date
+
+    def __init__(self, date):
+        self.date = date # Last day of every window, covers planned after it are counted as well
+        self.days = {} # Date -> {username -> covers on that date}, only dates still inside the longest window
+        self.counts = {window: {} for window in self.WINDOWS} # Window -> {username -> covers in that window}
+
+    def starts(self, window):
+        """Returns the first date inside a window"""
+        return self.date - datetime.timedelta(days=self.WINDOWS[window] - 1)
+
+    def add(self, teacher, date, count=1):
+        """Counts covers a teacher took on a date in every window that date is inside, a negative count takes them away"""
+        if date < self.starts("term"): # Too old for any window
+            return
+        day = self.days.setdefault(date, {})
+        day[teacher] = day.get(teacher, 0) + count
+        for window, counts in self.counts.items():
+            if date >= self.starts(window):
+                counts[teacher] = counts.get(teacher, 0) + count
+
+    def remove(self, teacher, date, count=1):
+        """Takes back covers that were undone"""
+        self.add(teacher, date, -count)
+
+    def advance(self, date):
+        """Moves every window on to end at a new date, taking off only the days that have dropped out of each"""
+        if date <= self.date:
+            return
+        old_starts = {window: self.starts(window) for window in self.WINDOWS}
+        self.date = date
+        for window, counts in self.counts.items():
+            for day, covers in self.days.items():
+                if old_starts[window] <= day < self.starts(window): # Dropped out of this window with the move
+                    for teacher, count in covers.items():
+                        counts[teacher] -= count
+        for day in [day for day in self.days if day < self.starts("term")]:
+            del self.days[day]
+
+    def count(self, teacher, window):
+        """Returns how many covers a teacher has taken in a window"""
+        return self.counts[window].get(teacher, 0)
+
 class MainMenu(tk.Frame):
     """Main Menu Screen."""
 
@@ -858,18 +1609,18 @@ class RegisterScreen(tk.Frame):
             messagebox.showerror("Error", "Password must contain at least 9 characters, one uppercase letter, one lowercase letter, one digit, and one special character from (@$!%*?_&)")
             return
         
-        # If all validations pass, adds the user to the database
-        database.add_teacher(username, fullname, 'Normal Teacher',' ', 0, ' ')
-        database.store_password(username, password)
+        # Builds a week of default empty entries, 7 lessons for the first four days and 5 on Friday
+        grid = {day: [("Empty", "Empty", "None")] * 7 for day in self.days}
+        grid["Friday"] = [("Empty", "Empty", "None")] * 5
 
-        for x in range(4):
-            day = self.days[x] # Iterates the first four days of the week
-            for i in range(7): # Iterates through the 7 lessons a day
-                database.add_lesson(username, day, i+1, "Empty", "Empty", "None") # Adds default empty entries in the timetable
-                self.controller.current_user = username
-                self.controller.current_role = 'Normal Teacher' # Sets role to Normal teacher
-        for i in range(5): # Iterates similarly for Friday
-            database.add_lesson(username, "Friday", i+1, "Empty", "Empty", "None")
+        # If all validations pass, adds the user, password and timetable to the database in one transaction
+        with database.transaction():
+            database.add_teacher(username, fullname, 'Normal Teacher',' ', 0, ' ')
+            database.store_password(username, password)
+            database.add_week(username, grid)
+
+        self.controller.current_user = username
+        self.controller.current_role = 'Normal Teacher' # Sets role to Normal teacher
 
         messagebox.showinfo("Registration Successful!", "Contact an SLT member to get your timetable configured.") # Informs the user of successful registration
         self.controller.frames[TeacherScreen].update_welcome_message() # Updates the welcome message with the teacher's name
@@ -1030,22 +1781,15 @@ class Timetable(ttk.Frame):
         """Update the timetable with the current user's lessons."""
         if self.weekday in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
             
-            connection = sqlite3.connect("MyTimetable.db")
-            cursor = connection.cursor()
-
             self.tree.delete(*self.tree.get_children()) # Clear existing timetable entries
 
-            # Query to fetch lessons for the current user based on the weekday
-            cursor.execute(f"""SELECT Subject, Class, Substitute
-                            FROM {self.weekday}Lessons
-                            WHERE Username = ? 
-                            ORDER BY Lesson_Number""", (self.controller.current_user,))
-            lessons = cursor.fetchall() # Fetches all the lessons
+            # Fetches lessons for the current user based on the weekday, ordered by lesson number
+            lessons = database.get_all_lessons(self.controller.current_user, self.weekday)
 
             # Extracts the subjects, classes, and substitutes from the lessons lists
-            subjects = [lesson[0] for lesson in lessons] # List of subjects
-            classes = [lesson[1] for lesson in lessons] # List of classes
-            substitutes = [lesson[2] for lesson in lessons] # List of substitutes
+            subjects = [lesson[2] for lesson in lessons] # List of subjects
+            classes = [lesson[3] for lesson in lessons] # List of classes
+            substitutes = [lesson[4] for lesson in lessons] # List of substitutes
 
             # Insert the fetched data into the timetable
             self.tree.insert("", "end", values=["Subject"] + subjects)
@@ -1054,8 +1798,6 @@ class Timetable(ttk.Frame):
 
             self.tree.pack(pady=10, padx=10, fill="x")
 
-            connection.close()
-
     def on_double_click(self, event):
         """Handles double-click events on the timetable"""
         if self.tree.identify_region(event.x, event.y) == "heading":
@@ -1198,6 +1940,11 @@ class SLTScreen(tk.Frame):
                   command=lambda: controller.show_frame(AbsenceScreen))
         absent.place(x=650, y=0)
 
+        # Covers absences already marked for the coming days instead of waiting for each morning's run
+        plan = tk.Button(self, text="Plan Covers Ahead", width=20, height=3, relief="groove",
+                  command=lambda: self.plan_ahead())
+        plan.place(x=495, y=0)
+
         signout = tk.Button(self, text="Sign Out", width=15, height=2, relief="groove", 
                   command=lambda: self.sign_out())
         signout.place(x=685, y=55)
@@ -1207,6 +1954,7 @@ class SLTScreen(tk.Frame):
         controller.binder(sltabsent)
         controller.binder(view)
         controller.binder(absent)
+        controller.binder(plan)
         controller.binder(signout)
 
         #to instantly run the algorithm for testing purposes
@@ -1245,6 +1993,18 @@ class SLTScreen(tk.Frame):
         
         self.controller.show_frame(MainMenu)
 
+    def plan_ahead(self):
+        """Allocates cover for the next school days after today, as each morning's run would"""
+        count = simpledialog.askinteger("Plan Covers Ahead", "Number of school days to plan:", initialvalue=5, minvalue=1, maxvalue=60)
+        if count is None: # Cancelled
+            return
+
+        tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+        runs = MainAlgorithm.allocate_range(self.controller, MainAlgorithm.school_days(tomorrow, count))
+        covers = sum(len(run.CoverAllocations) for run in runs)
+        unfilled = sum(len(run.UnfilledLessons) for run in runs)
+        messagebox.showinfo("Plan Covers Ahead", f"{covers} lessons covered over the next {count} school days\n{unfilled} lessons could not be covered")
+
     def time(self):
         string = strftime('%H:%M %p')
         self.clock.config(text=string)
@@ -1861,10 +2621,10 @@ class SLTAbsenceConfirmation(tk.Frame):
         #Displays absence success message
         messagebox.showinfo("Success", f"{fullname} is marked Absent for: {', '.join(map(str, dates))}")
 
-        # Checks if the current time is within the allowed range for cover allocation
-        if now >= first_time and now <= last_time:
+        # Checks if the current time is within the allowed range for cover allocation and the absence includes today
+        if now >= first_time and now <= last_time and datetime.datetime.today().date() in dates:
             M = MainAlgorithm(self.controller) # Creates an instance of MainAlgorithm
-            M.cover_allocation() # Calls the cover allocation algorithm
+            M.allocate_late_absence(username) # Only covers this teacher's remaining lessons, the morning's covers are kept
 
         self.clear_entries()
         self.controller.go_back()
@@ -2122,13 +2882,11 @@ class AddTeacherScreen(tk.Frame):
                 detected = 0
                 return
         
-        # Adds the teacher to the database and stores password as hash keeping no record of the actual password
-        database.add_teacher(username, fullname, role, department, 0, cover_limit)
-        database.store_password(username, password)
-
+        grid = {} # Day -> list of lessons, saved in one go with add_week
         for x in range(4):
             day = self.days[x]
             self.current_timetable = self.timetables[x]
+            grid[day] = []
             for i in range(7):
                 subject, class_name, substitute = self.get_lesson(i+1)
                 if subject == "Empty" or subject == "" or subject == "Free":
@@ -2137,10 +2895,11 @@ class AddTeacherScreen(tk.Frame):
                     substitute = ""
                 else:
                     substitute = "None" # Set substitute to None
-                database.add_lesson(username, day, i+1, subject, class_name, substitute) # Adds lesson to the database
+                grid[day].append((subject, class_name, substitute))
         
         day = "Friday"
         self.current_timetable = self.timetables[4]
+        grid[day] = []
         for i in range(5):
             subject, class_name, substitute = self.get_friday_lesson(i+1)
             if subject == "Empty" or subject == "" or subject == "Free":
@@ -2149,8 +2908,13 @@ class AddTeacherScreen(tk.Frame):
                 substitute = ""
             else:
                 substitute = "None"
+            grid[day].append((subject, class_name, substitute))
 
-            database.add_lesson(username, day, i+1, subject, class_name, substitute)
+        # Adds the teacher, password hash and whole week to the database in a single transaction, keeping no record of the actual password
+        with database.transaction():
+            database.add_teacher(username, fullname, role, department, 0, cover_limit)
+            database.store_password(username, password)
+            database.add_week(username, grid)
         
         self.controller.update_all_timelines()
 
@@ -2198,7 +2962,13 @@ class AccessDatabaseScreen(tk.Frame):
                   command=lambda: self.controller.go_back())
         back.place(x=0, y=0)
 
+        # Saves every department's cover load at once instead of viewing teachers one by one
+        report = tk.Button(self, text="Cover Report", width=20, height=3, relief="groove",
+                  command=lambda: self.export_report())
+        report.place(x=650, y=0)
+
         controller.binder(back)
+        controller.binder(report)
 
         # Configures the style for the treeview
         style = ttk.Style()
@@ -2256,6 +3026,34 @@ class AccessDatabaseScreen(tk.Frame):
         height = self.tree.winfo_height()
         if height > max_height:
             self.tree.configure(height=max_height // 20)
+
+    def export_report(self):
+        """Asks for a date range and a file, then saves the cover report for that range"""
+        today = datetime.date.today()
+        year_start = datetime.date(today.year if today.month >= 9 else today.year - 1, 9, 1) # Defaults to the school year so far
+
+        start = simpledialog.askstring("Cover Report", "Start date (YYYY-MM-DD):", initialvalue=year_start.isoformat())
+        if start is None:
+            return
+        end = simpledialog.askstring("Cover Report", "End date (YYYY-MM-DD):", initialvalue=today.isoformat())
+        if end is None:
+            return
+
+        try:
+            start = datetime.date.fromisoformat(start.strip())
+            end = datetime.date.fromisoformat(end.strip())
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be written as YYYY-MM-DD!")
+            return
+        if end < start:
+            messagebox.showerror("Error", "The end date must not be before the start date!")
+            return
+
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV file", "*.csv"), ("JSON file", "*.json")])
+        if not path: # Cancelled
+            return
+        CoverReport(start, end).save(path)
+        messagebox.showinfo("Cover Report", f"Report saved to {path}")
         
     def on_click(self, event):
         """Handles click events on the Treeview"""
@@ -2377,11 +3175,12 @@ class ViewDatabaseScreen(tk.Frame):
         self.username = current_data.accessed_username
 
         # Fetches lessons for each day of the week for the database
-        MondayData = database.get_all_lessons(self.username, "Monday")
-        TuesdayData = database.get_all_lessons(self.username, "Tuesday")
-        WednesdayData = database.get_all_lessons(self.username, "Wednesday")
-        ThursdayData = database.get_all_lessons(self.username, "Thursday")
-        FridayData = database.get_all_lessons(self.username, "Friday")
+        week = database.get_week_lessons(self.username) # Fetches the whole week in a single query
+        MondayData = week["Monday"]
+        TuesdayData = week["Tuesday"]
+        WednesdayData = week["Wednesday"]
+        ThursdayData = week["Thursday"]
+        FridayData = week["Friday"]
 
         # Extracts lesson details for each day
         self.MondayLessons = [lesson[2] for lesson in MondayData]
@@ -2558,11 +3357,12 @@ class EditDatabaseScreen(tk.Frame):
         self.edit_username = current_data.accessed_username
 
         # Fetches lessons for each day of the week from the database 
-        MondayData = database.get_all_lessons(self.edit_username, "Monday")
-        TuesdayData = database.get_all_lessons(self.edit_username, "Tuesday")
-        WednesdayData = database.get_all_lessons(self.edit_username, "Wednesday")
-        ThursdayData = database.get_all_lessons(self.edit_username, "Thursday")
-        FridayData = database.get_all_lessons(self.edit_username, "Friday")
+        week = database.get_week_lessons(self.edit_username) # Fetches the whole week in a single query
+        MondayData = week["Monday"]
+        TuesdayData = week["Tuesday"]
+        WednesdayData = week["Wednesday"]
+        ThursdayData = week["Thursday"]
+        FridayData = week["Friday"]
 
         # Extracts lesson details for each day
         MondayLessons = [lesson[2] for lesson in MondayData]
@@ -2755,9 +3555,11 @@ class EditDatabaseScreen(tk.Frame):
                 detected = 0
                 return
 
+        grid = {}
         for x in range(4):
             day = self.days[x]
             self.current_timetable = self.timetables[x]
+            grid[day] = []
             for i in range(7):
                 subject, class_name, substitute = self.get_lesson(i+1)
                 if subject == "Empty" or subject == "" or subject == "Free":
@@ -2766,10 +3568,11 @@ class EditDatabaseScreen(tk.Frame):
                     substitute = ""
                 else:
                     substitute = "None"
-                database.add_lesson(username, day, i+1, subject, class_name, substitute)
+                grid[day].append((subject, class_name, substitute))
 
         day = "Friday"
         self.current_timetable = self.timetables[4]
+        grid[day] = []
         for i in range(5):
             subject, class_name, substitute = self.get_friday_lesson(i+1)
             if subject == "Empty" or subject == "" or subject == "Free":
@@ -2778,7 +3581,9 @@ class EditDatabaseScreen(tk.Frame):
                 substitute = ""
             else:
                 substitute = "None"
-            database.add_lesson(username, day, i+1, subject, class_name, substitute)
+            grid[day].append((subject, class_name, substitute))
+
+        database.add_week(username, grid) # Saves the whole week in one transaction
 
         self.controller.update_all_timelines()
         self.controller.frames[AccessDatabaseScreen].update_treeview() 
@@ -2914,11 +3719,12 @@ class AdminViewDatabase(tk.Frame): # Similar to ViewDatabase but with viewing ac
         current_data = AccessedData()
         self.username = current_data.accessed_username
 
-        MondayData = database.get_all_lessons(self.username, "Monday")
-        TuesdayData = database.get_all_lessons(self.username, "Tuesday")
-        WednesdayData = database.get_all_lessons(self.username, "Wednesday")
-        ThursdayData = database.get_all_lessons(self.username, "Thursday")
-        FridayData = database.get_all_lessons(self.username, "Friday")
+        week = database.get_week_lessons(self.username) # Fetches the whole week in a single query
+        MondayData = week["Monday"]
+        TuesdayData = week["Tuesday"]
+        WednesdayData = week["Wednesday"]
+        ThursdayData = week["Thursday"]
+        FridayData = week["Friday"]
 
         self.MondayLessons = [lesson[2] for lesson in MondayData]
         self.MondayClasses = [lesson[3] for lesson in MondayData]
@@ -3098,11 +3904,12 @@ class AdminEditDatabase(tk.Frame): # Similar to EditDatabase but with editing ac
         current_data = AccessedData()
         self.edit_username = current_data.accessed_username
 
-        MondayData = database.get_all_lessons(self.edit_username, "Monday")
-        TuesdayData = database.get_all_lessons(self.edit_username, "Tuesday")
-        WednesdayData = database.get_all_lessons(self.edit_username, "Wednesday")
-        ThursdayData = database.get_all_lessons(self.edit_username, "Thursday")
-        FridayData = database.get_all_lessons(self.edit_username, "Friday")
+        week = database.get_week_lessons(self.edit_username) # Fetches the whole week in a single query
+        MondayData = week["Monday"]
+        TuesdayData = week["Tuesday"]
+        WednesdayData = week["Wednesday"]
+        ThursdayData = week["Thursday"]
+        FridayData = week["Friday"]
 
         MondayLessons = [lesson[2] for lesson in MondayData]
         MondayClasses = [lesson[3] for lesson in MondayData]
@@ -3294,9 +4101,11 @@ class AdminEditDatabase(tk.Frame): # Similar to EditDatabase but with editing ac
             database.delete_password(username)
             database.store_password(username, password)
 
+        grid = {}
         for x in range(4):
             day = self.days[x]
             self.current_timetable = self.timetables[x]
+            grid[day] = []
             for i in range(7):
                 subject, class_name, substitute = self.get_lesson(i+1)
                 if subject == "Empty" or subject == "" or subject == "Free":
@@ -3305,10 +4114,11 @@ class AdminEditDatabase(tk.Frame): # Similar to EditDatabase but with editing ac
                     substitute = ""
                 else:
                     substitute = "None"
-                database.add_lesson(username, day, i+1, subject, class_name, substitute)
+                grid[day].append((subject, class_name, substitute))
 
         day = "Friday"
         self.current_timetable = self.timetables[4]
+        grid[day] = []
         for i in range(5):
             subject, class_name, substitute = self.get_friday_lesson(i+1)
             if subject == "Empty" or subject == "" or subject == "Free":
@@ -3317,7 +4127,9 @@ class AdminEditDatabase(tk.Frame): # Similar to EditDatabase but with editing ac
                 substitute = ""
             else:
                 substitute = "None"
-            database.add_lesson(username, day, i+1, subject, class_name, substitute)
+            grid[day].append((subject, class_name, substitute))
+
+        database.add_week(username, grid) # Saves the whole week in one transaction
 
         self.controller.update_all_timelines()
         self.controller.frames[AccessDatabaseScreen].update_treeview() 
@@ -3348,137 +4160,202 @@ class AdminEditDatabase(tk.Frame): # Similar to EditDatabase but with editing ac
         self.controller.show_frame(AccessDatabaseScreen)
 
 class MainAlgorithm():
-    def __init__(self, controller):
-        self.controller = controller  # Store reference to MyTimetableApp
-        self.date = datetime.datetime.now() # Gets the current data and time
-        self.weekday = datetime.datetime.today().strftime('%A') # Gets the current day of the week
+    SOLVERS = ("greedy", "flow", "vectorized", "sql") # Greedy takes lessons in order, flow plans the whole day at once, vectorized scores with NumPy, sql asks SQLite
+    LOADS = ("current",) + tuple(CoverWindows.WINDOWS) # This month's Current_Covers, or the covers in one of the rolling windows
+
+    # Start time of each lesson number, used to skip lessons that have already begun when an absence is confirmed late
+    LESSON_TIMES = {
+        1: datetime.time(8, 0),
+        2: datetime.time(8, 50),
+        3: datetime.time(9, 40),
+        4: datetime.time(10, 45),
+        5: datetime.time(11, 35),
+        6: datetime.time(12, 50),
+        7: datetime.time(13, 40),
+    }
+
+    def __init__(self, controller, date=None, seed=None, solver="greedy", teachers=None, load="current"):
+        if solver not in self.SOLVERS:
+            raise ValueError(f"Unknown solver {solver!r}, expected one of {', '.join(self.SOLVERS)}")
+        if solver == "vectorized" and np is None:
+            raise ImportError("The vectorized solver needs numpy installed")
+        if load not in self.LOADS:
+            raise ValueError(f"Unknown load {load!r}, expected one of {', '.join(self.LOADS)}")
+        if solver in ("sql", "flow") and load != "current": # sql orders by Current_Covers in its query, flow compares covers with the monthly limit
+            raise ValueError(f"The {solver} solver can only use the current load")
+        self.controller = controller  # Store reference to MyTimetableApp, None when running without the UI
+        self.date = date if date is not None else datetime.datetime.now() # Gets the current data and time unless a date is given
+        self.weekday = self.date.strftime('%A') # Gets the day of the week being allocated
+        self.random = random.Random(seed) # Breaks ties between equally loaded teachers, a seed makes runs repeatable
+        self.solver = solver # How teachers are chosen for the cover needing lessons
+        self.load = load # Which cover count teachers are compared on
         self.AllTeachers = [] # List to store all the teachers
-        self.AllTeachers = database.get_all_usernames() # Fetches all usernames from the database
+        if teachers is not None: # Given by the simulator so thousands of runs don't each query the usernames
+            self.AllTeachers = list(teachers)
+        else:
+            self.AllTeachers = [teacher[0] for teacher in database.get_all_usernames()] # Fetches all usernames from the database
         self.AbsentTeachers = [] # List to store absent teachers
         self.NonAbsentTeachers = [] # List to store teachers that aren't absent
         self.CoverNeedingLessons = [] # List to store lessons that need cover
         self.CoverAllocations = [] # List to store cover allocations
+        self.UnfilledLessons = [] # List to store lessons no free teacher could be found for
+        self.UnfilledAssignments = [] # (absent teacher, day, lesson number) of those lessons, saved with the covers
+        self.stats = {} # How the run went, candidate pool reuse for the greedy solver
 
-    def cover_allocation(self):
+    def cover_allocation(self, snapshot=None, emails=True):
         """Allocates cover for absent teachers based on their lessons."""
-        # Identify absent teachers
-        for Teacher in self.AllTeachers: # Iterate all the teachers
-            if database.is_absent(Teacher, self.date): # Check if they are absent
-                self.AbsentTeachers.append(Teacher) # Appends them to the AbsentTeachers list
+        if snapshot is None:
+            snapshot = database.load_day_snapshot(self.date) # Loads the whole day once, the rest of the run works from memory
 
-        self.NonAbsentTeachers = self.AllTeachers
+        # Identify absent teachers with a single lookup on the date
+        absent = database.get_absent_on(self.date)
+        self.plan(snapshot, absent)
+        self.save(emails)
 
-        for Teacher in self.AbsentTeachers: # Iterates all the absent teachers
-            self.NonAbsentTeachers.remove(Teacher) # Removes teachers who are absent from the non absent teachers list
+    def plan(self, snapshot, absent):
+        """Works out the covers for a set of absent teachers on a snapshot without saving anything"""
+        self.AbsentTeachers = [Teacher for Teacher in self.AllTeachers if Teacher in absent] # Keeps the teachers' stored order
+        self.NonAbsentTeachers = [Teacher for Teacher in self.AllTeachers if Teacher not in absent]
 
         for Teacher in self.AbsentTeachers: # Iterates all the absent teachers
-            lessons = database.get_all_lessons(Teacher, self.weekday) # Gets all the lessons of the teacher
+            lessons = sorted(snapshot.lessons.get(Teacher, {}).values(), key=lambda lesson: lesson[1]) # Gets all the lessons of the teacher
             for lesson in lessons: # Iterates all lessons
-                if lesson[2] != "Free" and lesson[3] != "" and lesson[4] == "None" and lesson[2] != "Empty": 
+                if self.needs_cover(lesson): 
                     self.CoverNeedingLessons.append(lesson) # Appends all non free lessons
 
-        for x in range(len(self.CoverNeedingLessons)): # Iterates all cover need lessons
+        self.choose(snapshot)
+
+    @classmethod
+    def allocate_range(cls, controller, dates, seed=None, solver="greedy", load="current"):
+        """Allocates cover for several school days ahead in one pass, returns the run for each date in order"""
+        dates = sorted(date for date in dates if date.weekday() < 5) # Weekends have no lessons
+
+        runs = [] # Covers are dated, so a weekday can come up more than once and each run only sees its own date's covers
+        for date in dates:
+            # Each day is run as the morning run would, so the cover counts it saves carry on to the next day
+            run = cls(None, date, seed, solver, load=load)
+            run.cover_allocation(emails=False) # The morning run on each date emails about whatever is still unfilled then
+            runs.append(run)
+
+        if controller is not None: # Refreshes the screens once for the whole batch
+            controller.update_all_timelines()
+        return runs
+
+    @staticmethod
+    def school_days(start, count):
+        """Returns the next count school days from start, start included if it is one"""
+        days = []
+        while len(days) < count:
+            if start.weekday() < 5:
+                days.append(start)
+            start += datetime.timedelta(days=1)
+        return days
+
+    def allocate_late_absence(self, username):
+        """Covers the rest of the day for a teacher marked absent after the morning run, leaving every other cover alone"""
+        snapshot = database.load_day_snapshot(self.date) # The day as it has already been saved, including this morning's covers
+
+        absent = database.get_absent_on(self.date)
+        self.AbsentTeachers = [username]
+        self.NonAbsentTeachers = [Teacher for Teacher in self.AllTeachers if Teacher not in absent]
+
+        now = self.date.time()
+        covers_given = dict(database.get_covers_given(username, self.date)) # Lesson_Number -> absent teacher they were covering
+        for lesson in sorted(snapshot.lessons.get(username, {}).values(), key=lambda lesson: lesson[1]):
+            start = self.LESSON_TIMES.get(lesson[1])
+            if start is None or start <= now: # Lessons that have started are left as they are
+                continue
+            if self.needs_cover(lesson):
+                self.CoverNeedingLessons.append(lesson)
+            elif lesson[1] in covers_given: # They were covering someone, that lesson is given to another teacher
+                self.CoverNeedingLessons.append((covers_given[lesson[1]], lesson[1], lesson[2], lesson[3], "None"))
+
+        self.choose(snapshot)
+        self.save()
+
+    @staticmethod
+    def needs_cover(lesson):
+        """Checks whether a lesson row is a taught lesson that hasn't been covered yet"""
+        return lesson[2] != "Free" and lesson[3] != "" and lesson[4] == "None" and lesson[2] != "Empty"
+
+    def choose(self, snapshot):
+        """Chooses a teacher for every lesson in CoverNeedingLessons, updating the snapshot as it goes"""
+        if self.load != "current": # The snapshot's cover counts become the window counts, so every solver scores on them unchanged
+            windows = database.get_cover_windows(self.date)
+            for teacher, record in snapshot.teachers.items():
+                record.current_covers = windows.count(teacher, self.load)
+        availability = AvailabilityIndex(snapshot, self.NonAbsentTeachers) # Free teachers per lesson number, kept up to date as covers are given
+        heaps = CoverHeaps(availability, snapshot.teachers, self.random) # Free teachers ordered by cover percentage
+        if self.solver == "flow":
+            planned = CoverFlow(snapshot, availability, self.CoverNeedingLessons).solve() # Lesson position -> teacher for the whole day
+        elif self.solver == "vectorized":
+            planned = CoverArrays(snapshot, self.NonAbsentTeachers).plan(snapshot, self.CoverNeedingLessons, self.random)
+        elif self.solver == "sql":
+            planned = SqlCandidates(self.weekday, self.date, self.NonAbsentTeachers).plan(snapshot, self.CoverNeedingLessons, self.random)
+
+        # Works through the lessons a lesson number at a time so each candidate pool is built once and used up before the next
+        order = sorted(range(len(self.CoverNeedingLessons)), key=lambda x: self.CoverNeedingLessons[x][1])
+        for x in order: # Iterates all cover need lessons
             # Defines absent teacher's info
             absent_teacher = self.CoverNeedingLessons[x][0]
-            absent_teacher_name = database.get_fullname(absent_teacher)
-            absent_teacher_department = database.get_subject_department(absent_teacher)
+            absent_teacher_name = snapshot.teachers[absent_teacher].fullname
+            absent_teacher_department = snapshot.teachers[absent_teacher].subject_department
             absent_lesson_num = self.CoverNeedingLessons[x][1]
             absent_subject = self.CoverNeedingLessons[x][2]
             absent_class = self.CoverNeedingLessons[x][3]
-            FreeTeachers = [] 
-            SameDepartmentTeachers = []
-            SuitableTeachers = []
 
-            for teacher in self.NonAbsentTeachers: # Iterates all non absent teachers
-                lesson = database.get_one_lesson(teacher, self.weekday, absent_lesson_num)
-                if lesson[2] == "Free":
-                    FreeTeachers.append(teacher) # Appends if they are free during a cover needing lesson
+            if self.solver != "greedy":
+                selected_teacher = planned.get(x) # None if the plan couldn't cover the lesson
+            else:
+                # Picks the lowest cover percentage from same department teachers if there are any, otherwise from every free teacher
+                selected_teacher = heaps.lowest_in_department(absent_lesson_num, absent_teacher_department)
+                if selected_teacher is None:
+                    selected_teacher = heaps.lowest(absent_lesson_num)
             
-            if not FreeTeachers: # Sends an email if there are no free teachers found for a certain cover needing lesson
-                self.send_email(absent_teacher_name, absent_lesson_num, absent_subject, absent_class)
+            if selected_teacher is None: # Records the lesson so an email is sent once the run is saved
+                self.UnfilledLessons.append([absent_teacher_name, absent_lesson_num, absent_subject, absent_class])
+                self.UnfilledAssignments.append((absent_teacher, self.weekday, absent_lesson_num))
                 
             else:
-                for teacher in FreeTeachers: # Iterates through free teachers
-                    department = database.get_subject_department(teacher)
-                    if department == absent_teacher_department: # Checks teacher's department against the absent teacher's department
-                        SameDepartmentTeachers.append(teacher) # Appends if same department
-                
-                if not SameDepartmentTeachers: # If there are no same department teachers
-                    lowest_cover_percentage = 9999 # Sets lowest percentage to an extremely high amount
-                    for teacher in FreeTeachers: # Iterates through free teachers since there are no same department teachers
-                        current = database.get_current_covers(teacher) 
-                        limit = database.get_cover_limit(teacher)
-                        cover_precentage = ( current / limit ) * 100 # Calculates cover percentage using curren covers and cover limit
-                        
-                        # Iterates to find the teacher with the lowest cover percentage
-                        if cover_precentage < lowest_cover_percentage: 
-                            lowest_cover_percentage = cover_precentage
-                            SuitableTeachers = [teacher]
-                        elif cover_precentage == lowest_cover_percentage:
-                            SuitableTeachers.append(teacher)
-
-                    selected_teacher = random.choice(SuitableTeachers) # Randomly selects between suitable teachers
-                    # Appends the cover allocation list and edits the lessons in the database
-                    self.CoverAllocations.append([absent_teacher, selected_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class])
-                    database.edit_lesson(selected_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class, f"Subbing\n{absent_teacher_name}")
-                    database.edit_lesson(absent_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class, f"Subbed\nby {selected_teacher[0]}")
-
-                    database.increment_current_covers(selected_teacher) # Increments the current covers
-
-                else:
-                    # Iterates similarly based on cover percentage but for same department teachers
-                    lowest_cover_percentage = 999
-                    for teacher in SameDepartmentTeachers:
-                        current = database.get_current_covers(teacher)
-                        limit = database.get_cover_limit(teacher)
-                        cover_precentage = ( current / limit ) * 100
-
-                        if cover_precentage < lowest_cover_percentage:
-                            lowest_cover_percentage = cover_precentage
-                            SuitableTeachers = [teacher]
-                        elif cover_precentage == lowest_cover_percentage:
-                            SuitableTeachers.append(teacher)
-
-                    selected_teacher = random.choice(SuitableTeachers)
-                    self.CoverAllocations.append([absent_teacher, selected_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class])
-                    database.edit_lesson(selected_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class, f"Subbing\n{absent_teacher_name}")
-                    database.edit_lesson(absent_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class, f"Subbed\nby {selected_teacher[0]}")
-
-                    database.increment_current_covers(selected_teacher)
+                # Appends the cover allocation list, the database is only written once every lesson has been allocated
+                self.CoverAllocations.append([absent_teacher, selected_teacher, self.weekday, absent_lesson_num, absent_subject, absent_class, absent_teacher_name])
+
+                # Keeps the snapshot up to date so the teacher isn't picked twice for the same lesson
+                snapshot.set_lesson(selected_teacher, absent_lesson_num, absent_subject, absent_class, f"Subbing\n{absent_teacher_name}")
+                snapshot.set_lesson(absent_teacher, absent_lesson_num, absent_subject, absent_class, f"Subbed\nby {selected_teacher}")
+                snapshot.add_cover(selected_teacher)
+                availability.take(selected_teacher, absent_lesson_num)
+
+        self.stats = dict(heaps.stats, lessons=len(self.CoverNeedingLessons),
+                          lesson_numbers=len({lesson[1] for lesson in self.CoverNeedingLessons}))
+
+    def save(self, emails=True):
+        """Saves the chosen covers, emails about the lessons that couldn't be covered and refreshes the screens"""
+        # Saves every cover and counter update in one transaction
+        database.apply_cover_assignments(self.CoverAllocations, self.date, self.UnfilledAssignments)
+
+        if emails:
+            for lesson in self.UnfilledLessons: # Sends an email for each lesson no free teacher was found for
+                self.send_email(*lesson)
         
         #Refresh the entire timetable UI
-        self.controller.frames[SLTScreen].timetable.update_timetable()
-        self.controller.frames[TeacherScreen].timetable.update_timetable()
-        self.controller.frames[AccessDatabaseScreen].update_treeview() 
-        self.controller.frames[ViewDatabaseScreen].update_labels()
-        self.controller.frames[AdminViewDatabase].update_labels()   
-        self.controller.frames[SLTAbsenceConfirmation].update_absent_teachers()
+        if self.controller is not None:
+            self.controller.frames[SLTScreen].timetable.update_timetable()
+            self.controller.frames[TeacherScreen].timetable.update_timetable()
+            self.controller.frames[AccessDatabaseScreen].update_treeview() 
+            self.controller.frames[ViewDatabaseScreen].update_labels()
+            self.controller.frames[AdminViewDatabase].update_labels()   
+            self.controller.frames[SLTAbsenceConfirmation].update_absent_teachers()
     
     def revert_covers(self):
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-        for teacher in self.AllTeachers: # Iterates all the teachers
-            for x in range(5):
-                lessons = database.get_all_lessons(teacher, days[x])
-
-                for lesson in lessons: # Iterates all lessons
-                    if lesson[4] != "None":
-                        if lesson[4].startswith("Subbing"): # If teacher used to be substituting a lesson it returns to a free lesson
-                            lesson_num = lesson[1]
-                            subject = "Free"
-                            class_name = ""
-                            substitute = ""
-                            database.edit_lesson(teacher, days[x], lesson_num, subject, class_name, substitute)
-
-                        elif lesson[4].startswith("Subbed"): # If teacher was absent and got subbed returns lesson to normal with subsititute as None
-                            lesson_num = lesson[1]
-                            original = database.get_one_lesson(teacher, days[x], lesson_num)
-                            subject = original[2]
-                            class_name = original[3]
-                            substitute = "None"
-                            database.edit_lesson(teacher, days[x], lesson_num, subject, class_name, substitute) 
+        # Marks finished covers Completed so the timetables show the normal lessons again, covers planned ahead by allocate_range are left until their date
+        # Today's covers only finish at the end of the school day, before then (the revert before 6:00) only earlier dates are completed
+        end = self.date if self.date.hour >= 15 else self.date - datetime.timedelta(days=1)
+        database.revert_covers(end)
         
         #Refresh the entire timetable UI
-        self.controller.update_all_timelines()  
+        if self.controller is not None:
+            self.controller.update_all_timelines()  
 
     def send_email(self, Teacher, Lesson, Subject, Class):
         try:
@@ -3508,6 +4385,106 @@ class MainAlgorithm():
         except:
             pass
 
+class CoverSimulator:
+    """Runs what-if cover allocations on an in-memory copy of a day, nothing is saved and no emails are sent"""
+
+    def __init__(self, date=None, solver="greedy", load="current"):
+        self.date = date if date is not None else datetime.datetime.now() # The day's timetable and cover counts are taken as they are now
+        self.solver = solver
+        self.load = load
+        self.snapshot = database.load_day_snapshot(self.date) # Loaded once, every scenario works on its own copy
+        self.teachers = [teacher[0] for teacher in database.get_all_usernames()]
+
+    def run(self, absent, seed=None):
+        """Allocates cover as if the given teachers were absent, returns the MainAlgorithm holding CoverAllocations and UnfilledLessons"""
+        scenario = MainAlgorithm(None, self.date, seed, self.solver, teachers=self.teachers, load=self.load)
+        scenario.plan(self.snapshot.copy(), set(absent))
+        return scenario
+
+    def sweep(self, rates, scenarios=100, seed=None):
+        """Runs random absence sets at each absence rate, returns rate -> summary of the unfilled lessons"""
+        rng = random.Random(seed)
+        results = {}
+        for rate in rates:
+            unfilled = []
+            for _ in range(scenarios):
+                absent = rng.sample(self.teachers, round(rate * len(self.teachers)))
+                unfilled.append(len(self.run(absent, rng.random()).UnfilledLessons))
+            results[rate] = {
+                "scenarios": scenarios,
+                "mean_unfilled": sum(unfilled) / scenarios,
+                "worst_unfilled": max(unfilled),
+                "fully_covered": sum(count == 0 for count in unfilled) / scenarios, # Share of days every lesson was covered
+            }
+        return results
+
+class CoverReport:
+    """Per teacher and per department cover load over a date range, written to CSV or JSON as the rows are read"""
+
+    FIELDS = ("Level", "Department", "Username", "Fullname", "Covers_Taken", "Covers_Needed", "Unfilled", "Load_Ratio")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.months = ((end - start).days + 1) / 30 # Cover limits are monthly, so a teacher's allowance grows with the range
+
+    def allowance(self, cover_limit):
+        """Returns how many covers a limit allows over the range, or 0 if the teacher can't take covers"""
+        if not isinstance(cover_limit, int) or cover_limit <= 0:
+            return 0
+        return cover_limit * self.months
+
+    def row(self, level, department, username, fullname, totals):
+        """Makes one report row from [covers taken, covers needed, unfilled, allowance]"""
+        taken, needed, unfilled, allowance = totals
+        ratio = round(taken / allowance, 3) if allowance else None # Above 1 means more covers than the limits allow
+        return dict(zip(self.FIELDS, (level, department, username, fullname, taken, needed, unfilled, ratio)))
+
+    def rows(self):
+        """Yields each teacher as the query returns them, each department's totals after its last teacher and the school's at the end"""
+        department = None
+        department_totals = None
+        school_totals = [0, 0, 0, 0]
+        for subject_department, username, fullname, cover_limit, taken, needed, unfilled in database.get_cover_report(self.start, self.end):
+            if department_totals is not None and subject_department != department: # Rows come sorted by department
+                yield self.row("Department", department, "", "", department_totals)
+                department_totals = None
+            if department_totals is None:
+                department = subject_department
+                department_totals = [0, 0, 0, 0]
+
+            totals = [taken, needed, unfilled, self.allowance(cover_limit)]
+            for x in range(4):
+                department_totals[x] += totals[x]
+                school_totals[x] += totals[x]
+            yield self.row("Teacher", subject_department, username, fullname, totals)
+
+        if department_totals is not None:
+            yield self.row("Department", department, "", "", department_totals)
+        yield self.row("School", "", "", "", school_totals)
+
+    def write_csv(self, file):
+        """Writes the report to an open text file as CSV"""
+        writer = csv.DictWriter(file, fieldnames=self.FIELDS)
+        writer.writeheader()
+        for row in self.rows():
+            writer.writerow(row)
+
+    def write_json(self, file):
+        """Writes the report to an open text file as a JSON list, one row at a time rather than building the whole list"""
+        file.write("[")
+        for x, row in enumerate(self.rows()):
+            file.write(("," if x else "") + "\n" + json.dumps(row))
+        file.write("\n]\n")
+
+    def save(self, path):
+        """Writes the report to a file, as JSON if the name ends in .json and CSV otherwise"""
+        with open(path, "w", newline="") as file:
+            if path.lower().endswith(".json"):
+                self.write_json(file)
+            else:
+                self.write_csv(file)
+
 # Tkinter main loop
 if __name__ == "__main__":
     database = Database()
@@ -0,0 +1,469 @@
+"""Benchmarks for the cover allocation program
+
+Builds a synthetic school in a temporary database and times parts of the program against it.
+Run with: python benchmark.py readers
+      or: python benchmark.py getters
+      or: python benchmark.py solvers
+      or: python benchmark.py whatif
+      or: python benchmark.py suite --output results.json
+      or: python benchmark.py sql
+      or: python benchmark.py report
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import NEA
+
+DEPARTMENTS = ["Mathematics", "English", "Science", "Computing", "History", "Geography", "Art", "PE"]
+
+# How every connection behaved before the WAL profile, kept so the two can be compared
+ROLLBACK_PROFILE = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+
+def next_school_day(date):
+    """Returns the date itself if it is a weekday, otherwise the following Monday"""
+    while date.weekday() > 4:
+        date += datetime.timedelta(days=1)
+    return date
+
+def department_names(count):
+    """Returns count department names, made up ones after the real list runs out"""
+    return [DEPARTMENTS[x] if x < len(DEPARTMENTS) else f"Department {x + 1}" for x in range(count)]
+
+def build_school(path, teachers, absence_rate, seed, date, profile=None, free_rate=0.3, departments=len(DEPARTMENTS)):
+    """Creates a database with a random timetable for the given number of teachers and returns it"""
+    rng = random.Random(seed)
+    database = NEA.Database(path, profile)
+    NEA.database = database # MainAlgorithm and the screens use the module level instance
+    names = department_names(departments)
+
+    teacher_rows = []
+    lesson_rows = []
+    absence_rows = []
+    for x in range(teachers):
+        username = f"teacher{x}_gfs"
+        department = names[x % len(names)]
+        teacher_rows.append((username, f"Teacher {x}", "Normal Teacher", department, rng.randint(0, 4), rng.randint(5, 12)))
+
+        for day in NEA.Database.DAYS:
+            for lesson_num in range(1, (5 if day == "Friday" else 7) + 1):
+                if rng.random() < free_rate: # Roughly two free lessons a day by default
+                    lesson_rows.append((username, day, lesson_num, "Free", "", ""))
+                else:
+                    lesson_rows.append((username, day, lesson_num, department, f"{rng.randint(7, 13)}{rng.choice('ABCDEFGHJ')}", "None"))
+
+        if rng.random() < absence_rate:
+            absence_rows.append((username, date.strftime("%Y-%m-%d"), "Synthetic"))
+
+    with database.transaction() as cursor:
+        cursor.executemany("""INSERT INTO Teachers VALUES (?, ?, ?, ?, ?, ?)""", teacher_rows)
+        cursor.executemany("""INSERT INTO Lessons VALUES (?, ?, ?, ?, ?, ?)""", lesson_rows)
+        cursor.executemany("""INSERT INTO AbsenceLog VALUES (?, ?, ?)""", absence_rows)
+    database.invalidate_teacher() # Teachers were inserted behind the cache's back
+
+    return database
+
+def percentile(values, fraction):
+    """Returns the value below which the given fraction of the sorted values fall"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def reader(path, profile, date, teachers, ready, stop, results):
+    """Runs in its own process like another SLT workstation, timing timetable reads until told to stop"""
+    database = NEA.Database(path, profile)
+    rng = random.Random(os.getpid())
+    latencies = []
+    ready.set()
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        database.get_week_lessons(f"teacher{rng.randrange(teachers)}_gfs") # What the view screens load
+        database.load_day_snapshot(date) # What the allocation loads
+        latencies.append(time.perf_counter() - start)
+
+    database.close()
+    results.put(latencies)
+
+def stop_readers(processes, stop):
+    """Tells the readers to stop and ends any that don't, so a failed run exits instead of hanging"""
+    stop.set()
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+def bench_readers(args):
+    """Times concurrent readers while allocation and revert runs write to the same database"""
+    date = next_school_day(datetime.datetime.now())
+    profiles = {"rollback journal": ROLLBACK_PROFILE, "WAL profile": NEA.Database.CONNECTION_PROFILE}
+
+    print(f"{args.teachers} teachers, {args.readers} readers, {args.runs} allocation runs on {date.strftime('%A')}")
+    for name, profile in profiles.items():
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "MyTimetable.db")
+            database = build_school(path, args.teachers, args.absence_rate, args.seed, date, profile)
+
+            ready = [multiprocessing.Event() for _ in range(args.readers)]
+            stop = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=reader, args=(path, profile, date, args.teachers, ready[x], stop, results))
+                         for x in range(args.readers)]
+            for process in processes:
+                process.start()
+            for process, event in zip(processes, ready):
+                while not event.wait(1): # A reader that failed to open the database would otherwise be waited on forever
+                    if not process.is_alive():
+                        stop_readers(processes, stop)
+                        raise SystemExit(f"a reader exited with code {process.exitcode} before it was ready")
+
+            run_times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                MainAlgorithm = NEA.MainAlgorithm(None, date, args.seed)
+                MainAlgorithm.send_email = lambda *lesson: None # No emails from a benchmark
+                MainAlgorithm.cover_allocation()
+                NEA.MainAlgorithm(None, date.replace(hour=15), args.seed).revert_covers() # After school so the day's covers are completed
+                run_times.append(time.perf_counter() - start)
+
+            stop.set()
+            latencies = []
+            for _ in processes:
+                try:
+                    latencies.extend(results.get(timeout=60))
+                except queue.Empty:
+                    stop_readers(processes, stop)
+                    raise SystemExit("a reader stopped without reporting its timings")
+            for process in processes:
+                process.join()
+            database.close()
+
+        print(f"{name:>17}: allocation+revert {statistics.mean(run_times) * 1000:8.1f} ms | "
+              f"reader p50 {percentile(latencies, 0.5) * 1000:6.2f} ms  p95 {percentile(latencies, 0.95) * 1000:6.2f} ms  "
+              f"max {max(latencies) * 1000:7.2f} ms  ({len(latencies)} reads)")
+
+def time_per_call(function, calls):
+    """Returns the average time of a call to function in microseconds"""
+    start = time.perf_counter()
+    for x in range(calls):
+        function(x)
+    return (time.perf_counter() - start) / calls * 1000000
+
+def bench_getters(args):
+    """Compares the hot getters as they used to run (a connection per call) with the registry on a pooled connection"""
+    date = next_school_day(datetime.datetime.now())
+    day = date.strftime('%A')
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "MyTimetable.db")
+        database = build_school(path, args.teachers, 0.1, args.seed, date)
+
+        def per_call(sql, parameters):
+            """The old pattern, opening and closing a connection around every query"""
+            connection = sqlite3.connect(path)
+            cursor = connection.cursor()
+            cursor.execute(sql, parameters)
+            result = cursor.fetchall()
+            connection.close()
+            return result
+
+        def username(x):
+            return f"teacher{x % args.teachers}_gfs"
+
+        def uncached_teacher(x):
+            database.invalidate_teacher(username(x)) # Forces the registry query rather than a cache hit
+            return database.get_teacher(username(x))
+
+        queries = database.QUERIES
+        cases = [
+            ("get_one_lesson", lambda x: per_call(queries["get_one_lesson"], (username(x), day, x % 7 + 1)),
+                               lambda x: database.get_one_lesson(username(x), day, x % 7 + 1)),
+            ("get_all_lessons", lambda x: per_call(queries["get_all_lessons"], (username(x), day)),
+                                lambda x: database.get_all_lessons(username(x), day)),
+            ("is_absent", lambda x: per_call(queries["is_absent"], (username(x), date.strftime("%Y-%m-%d"))),
+                          lambda x: database.is_absent(username(x), date)),
+            ("get_teacher (uncached)", lambda x: per_call(queries["get_teacher"], (username(x),)), uncached_teacher),
+            ("get_fullname (cached)", lambda x: per_call(queries["get_teacher"], (username(x),)),
+                                      lambda x: database.get_fullname(username(x))),
+        ]
+
+        print(f"{args.teachers} teachers, {args.calls} calls each (microseconds per call)")
+        for name, before, after in cases:
+            before_time = time_per_call(before, args.calls)
+            after_time = time_per_call(after, args.calls)
+            print(f"{name:>24}: before {before_time:8.1f}  after {after_time:8.1f}  ({before_time / after_time:5.1f}x)")
+
+        database.close()
+
+def bench_solvers(args):
+    """Runs the greedy and flow solvers on the same school and compares the covers each chose"""
+    date = next_school_day(datetime.datetime.now())
+
+    print(f"{args.teachers} teachers, about {args.absences} absent, {args.free_rate:.0%} free lessons, {args.days} days")
+    solvers = [solver for solver in NEA.MainAlgorithm.SOLVERS if solver != "vectorized" or NEA.np is not None] # Vectorized needs numpy
+    totals = {solver: [0, 0, 0, 0, 0.0] for solver in solvers} # Solver -> [filled, unfilled, same department, over limit, seconds]
+    for day in range(args.days):
+        for solver in solvers:
+            with tempfile.TemporaryDirectory() as folder: # A fresh copy of the same school for each solver
+                database = build_school(os.path.join(folder, "MyTimetable.db"), args.teachers, args.absences / args.teachers,
+                                        args.seed + day, date, free_rate=args.free_rate)
+                MainAlgorithm = NEA.MainAlgorithm(None, date, args.seed, solver)
+                MainAlgorithm.send_email = lambda *lesson: None # No emails from a benchmark
+                start = time.perf_counter()
+                MainAlgorithm.cover_allocation()
+                totals[solver][4] += time.perf_counter() - start
+                totals[solver][0] += len(MainAlgorithm.CoverAllocations)
+                totals[solver][1] += len(MainAlgorithm.UnfilledLessons)
+                totals[solver][2] += sum(database.get_subject_department(cover[0]) == database.get_subject_department(cover[1])
+                                         for cover in MainAlgorithm.CoverAllocations)
+                totals[solver][3] += sum(teacher[4] > teacher[5] for teacher in database.get_all_teachers())
+                database.close()
+
+    for solver, (filled, unfilled, same_department, over_limit, seconds) in totals.items():
+        print(f"{solver:>10}: filled {filled:5}  unfilled {unfilled:5}  same department {same_department:5}  "
+              f"teachers over limit {over_limit:4}  {seconds / args.days * 1000:8.1f} ms per day")
+    print(f"flow filled {totals['flow'][0] - totals['greedy'][0]} more lessons than greedy, "
+          f"{totals['flow'][2] - totals['greedy'][2]} more with a same department teacher")
+
+def bench_whatif(args):
+    """Times what-if scenarios on the simulator and prints an absence rate sweep"""
+    date = next_school_day(datetime.datetime.now())
+
+    with tempfile.TemporaryDirectory() as folder:
+        database = build_school(os.path.join(folder, "MyTimetable.db"), args.teachers, 0, args.seed, date, free_rate=args.free_rate)
+        simulator = NEA.CoverSimulator(date, args.solver)
+
+        start = time.perf_counter()
+        results = simulator.sweep(args.rates, args.scenarios, args.seed)
+        seconds = time.perf_counter() - start
+        database.close()
+
+    total = args.scenarios * len(args.rates)
+    print(f"{args.teachers} teachers, {args.solver} solver: {total} scenarios in {seconds:.2f} s ({total / seconds * 60:,.0f} per minute)")
+    for rate, summary in results.items():
+        print(f"  {rate:5.0%} absent: mean unfilled {summary['mean_unfilled']:6.1f}  worst {summary['worst_unfilled']:4}  "
+              f"fully covered {summary['fully_covered']:5.0%}")
+
+def timings(seconds):
+    """Summarises repeated timings in milliseconds"""
+    return {"median_ms": round(statistics.median(seconds) * 1000, 3), "min_ms": round(min(seconds) * 1000, 3), "runs": len(seconds)}
+
+def bench_suite(args):
+    """Times allocation, revert, login and onboarding at each school size and writes the results as JSON"""
+    date = next_school_day(datetime.datetime.now()).replace(hour=6, minute=30, second=0, microsecond=0)
+    results = {
+        "suite": "cover-allocation",
+        "seed": args.seed,
+        "absence_rate": args.absence_rate,
+        "departments": args.departments,
+        "date": date.strftime("%Y-%m-%d"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "sizes": [],
+    }
+
+    for teachers in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            base = os.path.join(folder, "base.db")
+            database = build_school(base, teachers, args.absence_rate, args.seed, date, departments=args.departments)
+            logins = [f"teacher{x}_gfs" for x in range(min(teachers, 20))]
+            with database.transaction():
+                for username in logins:
+                    database.store_password(username, f"Password{username}")
+            database.close() # Checkpoints the WAL so the file can be copied for each run
+
+            allocation, revert, covers, unfilled = [], [], None, None
+            for run in range(args.repeats):
+                path = os.path.join(folder, f"run{run}.db")
+                shutil.copy(base, path) # Every run starts from the same school
+                database = NEA.Database(path)
+                NEA.database = database
+
+                MainAlgorithm = NEA.MainAlgorithm(None, date, args.seed)
+                MainAlgorithm.send_email = lambda *lesson: None # No emails from a benchmark
+                start = time.perf_counter()
+                MainAlgorithm.cover_allocation()
+                allocation.append(time.perf_counter() - start)
+                covers, unfilled = len(MainAlgorithm.CoverAllocations), len(MainAlgorithm.UnfilledLessons)
+                stats = MainAlgorithm.stats
+
+                start = time.perf_counter()
+                NEA.MainAlgorithm(None, date.replace(hour=15), args.seed).revert_covers()
+                revert.append(time.perf_counter() - start)
+
+                if run == 0:
+                    login = time_per_call(lambda x: database.verify_password(logins[x % len(logins)], f"Password{logins[x % len(logins)]}"), args.logins)
+
+                    # Onboards a department the way the Add Teacher screen does, teacher, password and week in one transaction each
+                    week = {day: [("Free", "", "")] * (5 if day == "Friday" else 7) for day in NEA.Database.DAYS}
+                    onboarding = []
+                    for x in range(args.onboard):
+                        username = f"new{x}_gfs"
+                        start = time.perf_counter()
+                        with database.transaction():
+                            database.add_teacher(username, f"New Teacher {x}", "Normal Teacher", DEPARTMENTS[0], 0, 10)
+                            database.store_password(username, "Password1")
+                            database.add_week(username, week)
+                        onboarding.append(time.perf_counter() - start)
+                database.close()
+
+        results["sizes"].append({
+            "teachers": teachers,
+            "cover_allocation": dict(timings(allocation), covers=covers, unfilled=unfilled, pools=stats),
+            "revert_covers": timings(revert),
+            "verify_password": {"mean_us": round(login, 1), "calls": args.logins},
+            "onboard_department": dict(timings(onboarding), teachers=args.onboard, total_ms=round(sum(onboarding) * 1000, 3)),
+        })
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+def bench_sql(args):
+    """Checks the SQL candidate query uses indexes and times the sql solver against the in-memory greedy engine"""
+    date = next_school_day(datetime.datetime.now()).replace(hour=6, minute=30, second=0, microsecond=0)
+
+    with tempfile.TemporaryDirectory() as folder:
+        base = os.path.join(folder, "base.db")
+        database = build_school(base, args.teachers, args.absence_rate, args.seed, date, free_rate=args.free_rate)
+        database.start_run_covers()
+        plan = database.query_plan("get_free_candidates", (date.strftime('%A'), 1, date.strftime("%Y-%m-%d"), date.strftime("%Y-%m-%d")))
+        database.close()
+
+        print("get_free_candidates query plan:")
+        for detail in plan:
+            print(f"  {detail}")
+        scans = [detail for detail in plan if detail.startswith("SCAN")]
+        if scans: # Every table should be reached through an index
+            raise SystemExit(f"full table scan in the candidate query: {scans}")
+
+        print(f"{args.teachers} teachers, {args.absence_rate:.0%} absent, {args.runs} runs each")
+        for solver in ("greedy", "sql"):
+            seconds = []
+            for run in range(args.runs):
+                path = os.path.join(folder, f"{solver}{run}.db")
+                shutil.copy(base, path) # Every run starts from the same school
+                database = NEA.Database(path)
+                NEA.database = database
+                MainAlgorithm = NEA.MainAlgorithm(None, date, args.seed, solver)
+                MainAlgorithm.send_email = lambda *lesson: None # No emails from a benchmark
+                start = time.perf_counter()
+                MainAlgorithm.cover_allocation()
+                seconds.append(time.perf_counter() - start)
+                database.close()
+            print(f"{solver:>7}: median {statistics.median(seconds) * 1000:8.1f} ms  "
+                  f"covers {len(MainAlgorithm.CoverAllocations)}  unfilled {len(MainAlgorithm.UnfilledLessons)}")
+
+def bench_report(args):
+    """Fills a school year of covers and times the cover report written as CSV and as JSON"""
+    start = next_school_day(datetime.date(datetime.date.today().year - 1, 9, 1))
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as folder:
+        database = build_school(os.path.join(folder, "MyTimetable.db"), args.teachers, 0, args.seed, start)
+        usernames = [teacher[0] for teacher in database.get_all_usernames()]
+
+        rows = [] # CoverAssignments rows, written straight in since only the report is being timed
+        date = start
+        for _ in range(args.days):
+            last = date # Last day given covers, the report ends here
+            day = date.strftime("%A")
+            for absent in rng.sample(usernames, round(args.absence_rate * len(usernames))):
+                for lesson_num in range(1, (5 if day == "Friday" else 7) + 1):
+                    if rng.random() < args.unfilled_rate:
+                        rows.append((date.strftime("%Y-%m-%d"), day, lesson_num, absent, None, "Unfilled"))
+                    else:
+                        rows.append((date.strftime("%Y-%m-%d"), day, lesson_num, absent, rng.choice(usernames), "Completed"))
+            date = next_school_day(date + datetime.timedelta(days=1))
+        with database.transaction() as cursor:
+            cursor.executemany("""INSERT OR IGNORE INTO CoverAssignments VALUES (?, ?, ?, ?, ?, ?)""", rows)
+
+        print(f"{args.teachers} teachers, {args.days} school days, {len(rows)} cover rows")
+        report = NEA.CoverReport(start, last)
+        for extension in ("csv", "json"):
+            path = os.path.join(folder, f"report.{extension}")
+            seconds = []
+            for _ in range(args.runs):
+                begin = time.perf_counter()
+                report.save(path)
+                seconds.append(time.perf_counter() - begin)
+            print(f"{extension:>5}: median {statistics.median(seconds) * 1000:8.1f} ms  {os.path.getsize(path):,} bytes")
+        database.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cover allocation benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    readers = subparsers.add_parser("readers", help="reader latency during allocation runs")
+    readers.add_argument("--teachers", type=int, default=300)
+    readers.add_argument("--readers", type=int, default=4)
+    readers.add_argument("--runs", type=int, default=10)
+    readers.add_argument("--absence-rate", type=float, default=0.1)
+    readers.add_argument("--seed", type=int, default=1)
+    readers.set_defaults(run=bench_readers)
+
+    getters = subparsers.add_parser("getters", help="per-call overhead of the hot getters")
+    getters.add_argument("--teachers", type=int, default=300)
+    getters.add_argument("--calls", type=int, default=5000)
+    getters.add_argument("--seed", type=int, default=1)
+    getters.set_defaults(run=bench_getters)
+
+    solvers = subparsers.add_parser("solvers", help="lessons covered by each solver")
+    solvers.add_argument("--teachers", type=int, default=150)
+    solvers.add_argument("--absences", type=int, default=40)
+    solvers.add_argument("--free-rate", type=float, default=0.15)
+    solvers.add_argument("--days", type=int, default=5)
+    solvers.add_argument("--seed", type=int, default=1)
+    solvers.set_defaults(run=bench_solvers)
+
+    whatif = subparsers.add_parser("whatif", help="what-if scenarios per minute and an absence rate sweep")
+    whatif.add_argument("--teachers", type=int, default=150)
+    whatif.add_argument("--rates", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5])
+    whatif.add_argument("--free-rate", type=float, default=0.3)
+    whatif.add_argument("--scenarios", type=int, default=200)
+    whatif.add_argument("--solver", choices=NEA.MainAlgorithm.SOLVERS, default="greedy")
+    whatif.add_argument("--seed", type=int, default=1)
+    whatif.set_defaults(run=bench_whatif)
+
+    suite = subparsers.add_parser("suite", help="allocation, revert, login and onboarding timings as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 5000])
+    suite.add_argument("--departments", type=int, default=len(DEPARTMENTS))
+    suite.add_argument("--absence-rate", type=float, default=0.1)
+    suite.add_argument("--repeats", type=int, default=3)
+    suite.add_argument("--logins", type=int, default=200)
+    suite.add_argument("--onboard", type=int, default=20)
+    suite.add_argument("--seed", type=int, default=1)
+    suite.add_argument("--output", help="file to write the JSON to, printed if not given")
+    suite.set_defaults(run=bench_suite)
+
+    sql = subparsers.add_parser("sql", help="index use and speed of the sql solver")
+    sql.add_argument("--teachers", type=int, default=5000)
+    sql.add_argument("--absence-rate", type=float, default=0.1)
+    sql.add_argument("--free-rate", type=float, default=0.3)
+    sql.add_argument("--runs", type=int, default=3)
+    sql.add_argument("--seed", type=int, default=1)
+    sql.set_defaults(run=bench_sql)
+
+    report = subparsers.add_parser("report", help="time to write a school year's cover report")
+    report.add_argument("--teachers", type=int, default=1000)
+    report.add_argument("--days", type=int, default=190)
+    report.add_argument("--absence-rate", type=float, default=0.1)
+    report.add_argument("--unfilled-rate", type=float, default=0.05)
+    report.add_argument("--runs", type=int, default=3)
+    report.add_argument("--seed", type=int, default=1)
+    report.set_defaults(run=bench_report)
+
+    args = parser.parse_args()
+    args.run(args)